@@ -0,0 +1,78 @@
+"""Compares the forward propagation time of the no-PML mass lumped
+acoustic solver when the right hand side is assembled every timestep and
+when the pre-assembled explicit update is used."""
+import time
+from copy import deepcopy
+
+import numpy as np
+import spyro
+
+dictionary = {}
+dictionary["options"] = {
+    "cell_type": "T",
+    "variant": "lumped",
+    "degree": 4,
+    "dimension": 2,
+}
+dictionary["parallelism"] = {
+    "type": "automatic",
+}
+dictionary["mesh"] = {
+    "Lz": 3.0,
+    "Lx": 3.0,
+    "Ly": 0.0,
+    "mesh_file": None,
+    "mesh_type": "firedrake_mesh",
+}
+dictionary["acquisition"] = {
+    "source_type": "ricker",
+    "source_locations": [(-1.1, 1.5)],
+    "frequency": 5.0,
+    "delay": 1.5,
+    "delay_type": "multiples_of_minimun",
+    "receiver_locations": spyro.create_transect((-1.8, 1.2), (-1.8, 1.8), 10),
+}
+dictionary["time_axis"] = {
+    "initial_time": 0.0,
+    "final_time": 1.0,
+    "dt": 0.0005,
+    "amplitude": 1,
+    "output_frequency": 10000,
+    "gradient_sampling_frequency": 10000,
+}
+dictionary["visualization"] = {
+    "forward_output": False,
+    "forward_output_filename": "results/forward_output.pvd",
+    "fwi_velocity_model_output": False,
+    "velocity_model_filename": None,
+    "gradient_output": False,
+    "gradient_filename": None,
+    "adjoint_output": False,
+    "adjoint_filename": None,
+}
+
+
+def run_forward(explicit_update):
+    local_dictionary = deepcopy(dictionary)
+    local_dictionary["time_axis"]["explicit_update"] = explicit_update
+    Wave_obj = spyro.AcousticWave(dictionary=local_dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.02})
+    Wave_obj.set_initial_velocity_model(constant=1.5)
+
+    t0 = time.time()
+    Wave_obj.forward_solve()
+    elapsed = time.time() - t0
+    return elapsed, Wave_obj.receivers_output
+
+
+if __name__ == "__main__":
+    assembled_time, assembled_record = run_forward(False)
+    explicit_time, explicit_record = run_forward(True)
+
+    difference = np.linalg.norm(assembled_record - explicit_record)
+    difference /= np.linalg.norm(assembled_record)
+
+    print(f"Assembled right hand side: {assembled_time:.2f} s", flush=True)
+    print(f"Explicit update: {explicit_time:.2f} s", flush=True)
+    print(f"Speed-up: {assembled_time / explicit_time:.2f}", flush=True)
+    print(f"Relative shot record difference: {difference:.2e}", flush=True)
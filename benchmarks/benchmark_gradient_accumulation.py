@@ -0,0 +1,89 @@
+"""Times the adjoint propagation in 2D and 3D when the gradient mass
+problem is solved for every sample and when the samples are accumulated
+and the mass problem is solved once."""
+import time
+from copy import deepcopy
+
+import numpy as np
+import spyro
+from spyro.solvers.backward_time_integration import backward_wave_propagator
+
+
+def get_dictionary(dimension):
+    dictionary = {}
+    dictionary["options"] = {
+        "cell_type": "T",
+        "variant": "lumped",
+        "degree": 4 if dimension == 2 else 2,
+        "dimension": dimension,
+    }
+    dictionary["parallelism"] = {
+        "type": "automatic",
+    }
+    dictionary["mesh"] = {
+        "Lz": 1.0,
+        "Lx": 1.0,
+        "Ly": 0.0 if dimension == 2 else 1.0,
+        "mesh_file": None,
+        "mesh_type": "firedrake_mesh",
+    }
+    if dimension == 2:
+        source_locations = [(-0.1, 0.5)]
+        receiver_locations = spyro.create_transect((-0.9, 0.2), (-0.9, 0.8), 10)
+    else:
+        source_locations = [(-0.1, 0.5, 0.5)]
+        receiver_locations = spyro.create_transect((-0.9, 0.2, 0.5), (-0.9, 0.8, 0.5), 10)
+    dictionary["acquisition"] = {
+        "source_type": "ricker",
+        "source_locations": source_locations,
+        "frequency": 5.0,
+        "delay": 1.5,
+        "delay_type": "multiples_of_minimun",
+        "receiver_locations": receiver_locations,
+    }
+    dictionary["time_axis"] = {
+        "initial_time": 0.0,
+        "final_time": 0.5,
+        "dt": 0.0005 if dimension == 2 else 0.001,
+        "amplitude": 1,
+        "output_frequency": 10000,
+        "gradient_sampling_frequency": 1,
+    }
+    dictionary["visualization"] = {
+        "forward_output": False,
+        "forward_output_filename": "results/forward_output.pvd",
+        "fwi_velocity_model_output": False,
+        "velocity_model_filename": None,
+        "gradient_output": False,
+        "gradient_filename": None,
+        "adjoint_output": False,
+        "adjoint_filename": None,
+    }
+    return dictionary
+
+
+def time_gradient(dictionary, dx, accumulate_gradient):
+    Wave_obj = spyro.AcousticWave(dictionary=deepcopy(dictionary))
+    Wave_obj.set_mesh(mesh_parameters={"dx": dx})
+    Wave_obj.set_initial_velocity_model(constant=1.5)
+    Wave_obj.forward_solve()
+    Wave_obj.misfit = Wave_obj.receivers_output.copy()
+
+    t0 = time.time()
+    dJ = backward_wave_propagator(Wave_obj, accumulate_gradient=accumulate_gradient)
+    elapsed = time.time() - t0
+    return elapsed, dJ.dat.data_ro.copy()
+
+
+if __name__ == "__main__":
+    for dimension, dx in [(2, 0.02), (3, 0.1)]:
+        dictionary = get_dictionary(dimension)
+        per_sample_time, per_sample_dJ = time_gradient(dictionary, dx, False)
+        accumulated_time, accumulated_dJ = time_gradient(dictionary, dx, True)
+        difference = np.linalg.norm(per_sample_dJ - accumulated_dJ)
+        difference /= np.linalg.norm(per_sample_dJ)
+
+        print(f"{dimension}D mass solve per sample: {per_sample_time:.2f} s", flush=True)
+        print(f"{dimension}D accumulated gradient: {accumulated_time:.2f} s", flush=True)
+        print(f"{dimension}D speed-up: {per_sample_time / accumulated_time:.2f}", flush=True)
+        print(f"{dimension}D relative gradient difference: {difference:.2e}", flush=True)
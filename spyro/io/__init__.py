@@ -6,6 +6,7 @@ from .basicio import (
     load_shots,
     read_mesh,
     interpolate,
+    convert_segy_to_hdf5,
     # ensemble_forward,
     # ensemble_forward_ad,
     # ensemble_forward_elastic_waves,
@@ -15,9 +16,14 @@ from .basicio import (
     parallel_print,
     saving_source_and_receiver_location_in_csv,
 )
+from .shot_store import ShotRecordStore
+from .grid_resampler import GridResampler
+from .shot_scheduler import ShotScheduler
 from .model_parameters import Model_parameters
 from .backwards_compatibility_io import Dictionary_conversion
 from . import dictionaryio
+from . import shot_store
+from . import shot_scheduler
 from . import boundary_layer_io
 
 __all__ = [
@@ -28,6 +34,7 @@ __all__ = [
     "load_shots",
     "read_mesh",
     "interpolate",
+    "convert_segy_to_hdf5",
     # "ensemble_forward",
     # "ensemble_forward_ad",
     # "ensemble_forward_elastic_waves",
@@ -39,6 +46,11 @@ __all__ = [
     "convert_old_dictionary",
     "Dictionary_conversion",
     "dictionaryio",
+    "shot_store",
+    "ShotRecordStore",
+    "GridResampler",
+    "shot_scheduler",
+    "ShotScheduler",
     "boundary_layer_io",
     "saving_source_and_receiver_location_in_csv",
 ]
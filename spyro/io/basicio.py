@@ -1,49 +1,25 @@
 from __future__ import with_statement
 
-import pickle
+import functools
+import hashlib
+import itertools
+import os
+import time
 
 import firedrake as fire
 import h5py
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
-from scipy.interpolate import griddata
+import scipy.sparse
 import segyio
+from SeismicMesh import write_velocity_model
 
-
-def ensemble_save_or_load(func):
-    """Decorator for read and write shots for ensemble parallelism"""
-
-    def wrapper(*args, **kwargs):
-        num = args[0].number_of_sources
-        comm = args[0].comm
-        custom_file_name = kwargs.get("file_name")
-        for snum in range(num):
-            if is_owner(comm, snum) and comm.comm.rank == 0:
-                if custom_file_name is None:
-                    func(
-                        *args,
-                        **dict(
-                            kwargs,
-                            source_id=snum,
-                            file_name="shots/shot_record_"
-                            + str(snum + 1)
-                            + ".dat",
-                        )
-                    )
-                else:
-                    func(
-                        *args,
-                        **dict(
-                            kwargs,
-                            source_id=snum,
-                            file_name="shots/"
-                            + custom_file_name
-                            + str(snum + 1)
-                            + ".dat",
-                        )
-                    )
-
-    return wrapper
+from .grid_resampler import GridResampler
+from .shot_store import ShotRecordStore
+from .shot_scheduler import (
+    ShotScheduler,
+    fires_encoded_supershot,
+    has_multiple_shots_per_member,
+)
 
 
 def ensemble_plot(func):
@@ -75,16 +51,51 @@ def ensemble_plot(func):
 #     return wrapper
 
 
+def _print_shot_time(wave, stage, shot, elapsed):
+    if not wave.print_shot_times:
+        return
+    comm = wave.comm
+    if comm.comm.rank == 0:
+        print(
+            f"Ensemble member {comm.ensemble_comm.rank}: {stage} of shot "
+            f"{shot} took {elapsed:.2f} s",
+            flush=True,
+        )
+
+
 def ensemble_propagator(func):
-    """Decorator for forward to distribute shots for ensemble parallelism"""
+    """Decorator for forward to distribute shots for ensemble parallelism.
+
+    Shots are assigned to the ensemble members by a ``ShotScheduler`` and
+    each member runs its shots back to back with the same operators. The
+    receiver records are kept in ``shot_records`` and the return value is
+    the one of the last shot. When the sources are fired as an encoded
+    supershot, each member runs it once.
+    """
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        num = args[0].number_of_sources
-        _comm = args[0].comm
-        for snum in range(num):
-            if is_owner(_comm, snum):
-                u, u_r = func(*args, **dict(kwargs, source_num=snum))
-                return u, u_r
+        wave = args[0]
+        if fires_encoded_supershot(wave):
+            wave.shot_records = {}
+            start = time.time()
+            result = func(*args, **dict(kwargs, source_num=0))
+            _print_shot_time(wave, "forward", 0, time.time() - start)
+            return result
+
+        scheduler = ShotScheduler(
+            wave.comm, wave.number_of_sources, mode=wave.shot_scheduling
+        )
+        wave.shot_records = {}
+        result = None
+        for snum in scheduler:
+            # Each shot starts from rest, not from the previous wavefield
+            wave.reset_states()
+            start = time.time()
+            result = func(*args, **dict(kwargs, source_num=snum))
+            wave.shot_records[snum] = result[1]
+            _print_shot_time(wave, "forward", snum, time.time() - start)
+        return result
 
     return wrapper
 
@@ -127,15 +138,59 @@ def ensemble_propagator(func):
 
 
 def ensemble_gradient(func):
-    """Decorator for gradient to distribute shots for ensemble parallelism"""
+    """Decorator for gradient to distribute shots for ensemble parallelism.
 
+    If ensemble members run more than one shot, the shots of the last
+    forward propagation are replayed: the forward solution of each shot
+    is recomputed (except for the last one, which is still stored), its
+    misfit is taken from ``misfit`` or from ``real_shot_record`` indexed
+    by shot, and the gradients of the shots are summed.
+    """
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        num = args[0].number_of_sources
-        _comm = args[0].comm
-        for snum in range(num):
-            if is_owner(_comm, snum):
-                grad = func(*args, **kwargs)
-                return grad
+        wave = args[0]
+        if not has_multiple_shots_per_member(wave):
+            start = time.time()
+            grad = func(*args, **kwargs)
+            _print_shot_time(
+                wave, "gradient", wave.current_source, time.time() - start
+            )
+            return grad
+
+        if wave.current_time == 0.0:
+            wave.forward_solve()
+        misfits = kwargs.pop("misfit", None)
+        kwargs.pop("forward_solution", None)
+
+        shots = list(wave.shot_records)
+        if shots:
+            # The forward solution of the last shot is still stored
+            shots.insert(0, shots.pop())
+        grad = None
+        for snum in shots:
+            start = time.time()
+            if snum != wave.current_source:
+                # The states hold the adjoint wavefield of the last shot
+                wave.reset_states()
+                wave.wave_propagator.__wrapped__(wave, source_num=snum)
+            if isinstance(misfits, dict):
+                misfit = misfits[snum]
+            else:
+                misfit = (
+                    wave.real_shot_record[snum]
+                    - wave.shot_records[snum]
+                )
+            shot_grad = func(wave, misfit=misfit, **kwargs)
+            if grad is None:
+                grad = shot_grad.copy(deepcopy=True)
+            else:
+                grad.dat.data[:] += shot_grad.dat.data_ro
+            _print_shot_time(wave, "gradient", snum, time.time() - start)
+
+        if grad is None:
+            grad = fire.Function(wave.function_space)
+        return grad
 
     return wrapper
 
@@ -161,9 +216,30 @@ def ensemble_gradient(func):
 #     return wrapper
 
 
+def get_grid_resampler(V, grid_spacing):
+    """Returns the cached resampler from ``V`` to the grid with the given
+    spacing, building it on first use.
+
+    The resamplers are stored on the function space, so that they are
+    freed together with it (e.g. after degree continuation or
+    remeshing). A module level weak dictionary would not work, since
+    the resampler itself references the space."""
+    resamplers = getattr(V, "_spyro_grid_resamplers", None)
+    if resamplers is None:
+        resamplers = {}
+        V._spyro_grid_resamplers = resamplers
+    if grid_spacing not in resamplers:
+        resamplers[grid_spacing] = GridResampler(V, grid_spacing)
+    return resamplers[grid_spacing]
+
+
 def write_function_to_grid(function, V, grid_spacing):
     """Interpolate a Firedrake function to a structured grid
 
+    The grid points are located in the mesh only on the first call for a
+    function space and spacing, later calls reuse the interpolation
+    weights.
+
     Parameters
     ----------
     function : firedrake.Function
@@ -182,46 +258,41 @@ def write_function_to_grid(function, V, grid_spacing):
     zi : numpy.ndarray
         Interpolated values on grid points
     """
-    # get DoF coordinates
-    m = V.ufl_domain()
-    W = fire.VectorFunctionSpace(m, V.ufl_element())
-    coords = fire.interpolate(m.coordinates, W)
-    x, y = coords.dat.data[:, 0], coords.dat.data[:, 1]
-
-    # add buffer to avoid NaN when calling griddata
-    min_x = np.amin(x) + 0.01
-    max_x = np.amax(x) - 0.01
-    min_y = np.amin(y) + 0.01
-    max_y = np.amax(y) - 0.01
+    resampler = get_grid_resampler(V, grid_spacing)
+    xi, yi = resampler.grid_coordinates[:2]
 
-    z = function.dat.data[:] * 1000.0  # convert from km/s to m/s
-
-    # target grid to interpolate to
-    xi = np.arange(min_x, max_x, grid_spacing)
-    yi = np.arange(min_y, max_y, grid_spacing)
-    xi, yi = np.meshgrid(xi, yi)
-
-    # interpolate
-    zi = griddata((x, y), z, (xi, yi), method="linear")
+    zi = resampler.resample(function) * 1000.0  # convert from km/s to m/s
 
     return xi, yi, zi
 
 
-def create_segy(velocity, filename):
+def create_segy(velocity, filename, grid_spacing=None):
     """Write the velocity data into a segy file named filename
 
     Parameters
     ----------
     velocity:
-        Firedrake function representing the values of the velocity
-        model to save
+        Array with the gridded velocity model, or a 2D Firedrake function
+        that is resampled to a grid with ``write_function_to_grid``
     filename: str
         Name of the segy file to save
+    grid_spacing: float (optional)
+        Grid spacing used when ``velocity`` is a Firedrake function
 
     Returns
     -------
     None
     """
+    if isinstance(velocity, fire.Function):
+        if grid_spacing is None:
+            raise ValueError("A grid spacing is needed to export a Function.")
+        comm = velocity.function_space().mesh().comm
+        _, _, velocity = write_function_to_grid(
+            velocity, velocity.function_space(), grid_spacing
+        )
+        if comm.rank != 0:
+            return
+
     spec = segyio.spec()
 
     velocity = np.flipud(velocity.T)
@@ -239,53 +310,90 @@ def create_segy(velocity, filename):
             f.trace[tr] = velocity[:, tr]
 
 
-@ensemble_save_or_load
-def save_shots(Wave_obj, source_id=0, file_name=None):
-    """Save a the shot record from last forward solve to a `pickle`.
+def _shot_store_directory(file_name):
+    if file_name is None:
+        file_name = "shot_record"
+    return os.path.join("shots", file_name)
+
+
+def _owned_shots(wave):
+    """Shots whose records this ensemble member loads. With dynamic
+    scheduling any member may run any shot."""
+    if getattr(wave, "shot_scheduling", "round_robin") == "dynamic":
+        return list(range(wave.number_of_sources))
+    return [
+        snum for snum in range(wave.number_of_sources)
+        if is_owner(wave.comm, snum)
+    ]
+
+
+def save_shots(Wave_obj, file_name=None, dtype=np.float32, compression=None):
+    """Save the shot records from last forward solve to a shot record
+    store, written in parallel by the ensemble member that ran each shot.
 
     Parameters
     ----------
     Wave_obj: `spyro.Wave` object
         A `spyro.Wave` object
-    source_id: int, optional by default 0
-        The source number
-    file_name: str, optional by default shot_number_#.dat
-        The filename to save the data as a `pickle`
+    file_name: str, optional by default shot_record
+        Name of the store directory, inside the `shots` folder
+    dtype: numpy.dtype, optional by default float32
+        Storage precision
+    compression: str, optional by default None
+        None or "zlib"
 
     Returns
     -------
     None
 
     """
-    with open(file_name, "wb") as f:
-        pickle.dump(Wave_obj.forward_solution_receivers[:, source_id], f)
+    comm = Wave_obj.comm
+    records = Wave_obj.shot_records
+    shape = None
+    for record in records.values():
+        shape = np.shape(record)
+    # Members without shots do not know the record shape
+    shapes = comm.ensemble_comm.allgather(shape)
+    number_of_timesteps, number_of_receivers = next(
+        shape for shape in shapes if shape is not None
+    )
+    store = ShotRecordStore.create(
+        _shot_store_directory(file_name),
+        (Wave_obj.number_of_sources, number_of_timesteps, number_of_receivers),
+        dtype=dtype,
+        compression=compression,
+        comm=comm.global_comm,
+    )
+    if comm.comm.rank == 0:
+        for snum, record in records.items():
+            store.write(snum, record)
+    comm.global_comm.barrier()
     return None
 
 
-@ensemble_save_or_load
-def load_shots(Wave_obj, source_id=0, file_name=None):
-    """Load a `pickle` to a `numpy.ndarray`.
+def load_shots(Wave_obj, file_name=None):
+    """Load the records of the shots of each ensemble member from a shot
+    record store into ``shot_records``. Only those shots are read, and
+    ``forward_solution_receivers`` is set to the last of them.
 
     Parameters
     ----------
     Wave_obj: `spyro.Wave` object
         A `spyro.Wave` object
-    source_id: int, optional by default 0
-        The source number
-    filename: str, optional by default shot_number_#.dat
-        The filename to save the data as a `pickle`
+    file_name: str, optional by default shot_record
+        Name of the store directory, inside the `shots` folder
 
     Returns
     -------
-    array: `numpy.ndarray`
-        The data
+    None
 
     """
-    array = np.zeros(())
-
-    with open(file_name, "rb") as f:
-        array = np.asarray(pickle.load(f), dtype=float)
-        Wave_obj.forward_solution_receivers = array
+    store = ShotRecordStore(_shot_store_directory(file_name))
+    Wave_obj.shot_records = {
+        snum: store.read(snum) for snum in _owned_shots(Wave_obj)
+    }
+    for record in Wave_obj.shot_records.values():
+        Wave_obj.forward_solution_receivers = record
     return None
 
 
@@ -317,18 +425,260 @@ def _check_units(c):
     return c
 
 
-def interpolate(Model, fname, V):
+_segy_digests = {}
+
+
+def _file_digest(file_name, chunk_size=2**24):
+    """SHA-1 hash of the contents of a file. Hashes are memoized by path,
+    size and modification time."""
+    status = os.stat(file_name)
+    memo_key = (os.path.abspath(file_name), status.st_size, status.st_mtime_ns)
+    if memo_key not in _segy_digests:
+        digest = hashlib.sha1()
+        with open(file_name, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        _segy_digests[memo_key] = digest.hexdigest()
+    return _segy_digests[memo_key]
+
+
+def convert_segy_to_hdf5(
+    segy_file, cache_directory=None, comm=None, **conversion_parameters
+):
+    """Converts a SEG-Y velocity model to HDF5, reusing a previous
+    conversion of a file with the same content and parameters.
+
+    The HDF5 file is named after the hash of the SEG-Y content and of the
+    conversion parameters, so it is only written once by the first core
+    and then shared by every wave object and every run.
+
+    Parameters
+    ----------
+    segy_file: str
+        Name of the SEG-Y file.
+    cache_directory: str (optional)
+        Directory of the converted files. Defaults to the directory of
+        the SEG-Y file.
+    comm: MPI communicator (optional)
+        Communicator of all cores that need the file. Defaults to
+        COMM_WORLD.
+    conversion_parameters:
+        Keyword arguments passed to SeismicMesh's write_velocity_model.
+
+    Returns
+    -------
+    hdf5_file: str
+        Name of the converted HDF5 file.
+    """
+    if comm is None:
+        comm = fire.COMM_WORLD
+    if cache_directory is None:
+        cache_directory = os.path.dirname(segy_file)
+
+    hdf5_file = None
+    if comm.rank == 0:
+        digest = hashlib.sha1(_file_digest(segy_file).encode())
+        digest.update(repr(sorted(conversion_parameters.items())).encode())
+        base_name = os.path.splitext(os.path.basename(segy_file))[0]
+        hdf5_file = os.path.join(
+            cache_directory, f"{base_name}_{digest.hexdigest()[:16]}.hdf5"
+        )
+        if not os.path.exists(hdf5_file):
+            if cache_directory:
+                os.makedirs(cache_directory, exist_ok=True)
+            temporary_name = os.path.splitext(hdf5_file)[0] + f".tmp{os.getpid()}"
+            write_velocity_model(
+                segy_file, ofname=temporary_name, **conversion_parameters
+            )
+            os.replace(temporary_name + ".hdf5", hdf5_file)
+    return comm.bcast(hdf5_file, root=0)
+
+
+class SegyVelocityModel:
+    """Two dimensional velocity model read directly from a SEG-Y file with
+    memory-mapped trace access, without an intermediate HDF5 file.
+
+    Indexing follows the layout of the converted HDF5 ``velocity_model``
+    dataset: rows go from the deepest sample to the surface and columns
+    are traces. Only the traces inside the requested window are read.
+
+    Attributes
+    ----------
+    shape: tuple
+        Number of samples and number of traces.
+    """
+
+    def __init__(self, file_name):
+        self._file = segyio.open(file_name, ignore_geometry=True)
+        self._file.mmap()
+        self.shape = (len(self._file.samples), self._file.tracecount)
+
+    def __getitem__(self, window):
+        rows, columns = window
+        number_of_samples = self.shape[0]
+        traces = self._file.trace.raw[columns.start:columns.stop]
+        traces = np.atleast_2d(traces)[
+            :, number_of_samples - rows.stop:number_of_samples - rows.start
+        ]
+        return np.flipud(traces.T)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._file.close()
+
+
+_interpolation_weights = {}
+
+
+def _grid_bounds(Model):
+    """Physical extent (z, x, y) of the regular grid of a velocity model
+    file, including the absorbing layer if it is active."""
+    if Model.abc_active:
+        pad = Model.abc_pad_length
+    else:
+        pad = 0.0
+    return [
+        (-Model.length_z - pad, 0.0),
+        (0.0 - pad, Model.length_x + pad),
+        (0.0 - pad, Model.length_y + pad),
+    ]
+
+
+def _interpolation_weights_for(points, axes):
+    """Multilinear interpolation weights from a regular grid to points.
+
+    Only the window of grid nodes used by the stencils of the points is
+    referenced, so that each rank only has to read the hyperslab around
+    its own degrees of freedom.
+
+    Parameters
+    ----------
+    points: numpy.ndarray
+        Point coordinates with shape (number of points, dimension). They
+        have to be inside the grid.
+    axes: list of numpy.ndarray
+        Grid node coordinates along each axis.
+
+    Returns
+    -------
+    weights: scipy.sparse.csr_matrix
+        Matrix from the flattened grid window to the points.
+    window: tuple of slice
+        Hyperslab of the grid referenced by the weights.
+    """
+    dimension = len(axes)
+    lower = []
+    fractions = []
+    window = []
+    for axis, coordinate in zip(axes, points.T):
+        index = np.searchsorted(axis, coordinate, side="right") - 1
+        index = np.clip(index, 0, len(axis) - 2)
+        fractions.append(
+            (coordinate - axis[index]) / (axis[index + 1] - axis[index])
+        )
+        if len(index) > 0:
+            window.append(slice(int(index.min()), int(index.max()) + 2))
+        else:
+            window.append(slice(0, 0))
+        lower.append(index)
+
+    window_shape = tuple(s.stop - s.start for s in window)
+    number_of_points = len(points)
+    rows = []
+    columns = []
+    values = []
+    for corner in itertools.product((0, 1), repeat=dimension):
+        weight = np.ones(number_of_points)
+        local_index = []
+        for direction, offset in enumerate(corner):
+            fraction = fractions[direction]
+            weight = weight * (fraction if offset else 1.0 - fraction)
+            local_index.append(
+                lower[direction] + offset - window[direction].start
+            )
+        rows.append(np.arange(number_of_points))
+        if number_of_points > 0:
+            columns.append(np.ravel_multi_index(local_index, window_shape))
+        else:
+            columns.append(np.zeros(0, dtype=int))
+        values.append(weight)
+
+    weights = scipy.sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(number_of_points, int(np.prod(window_shape))),
+    )
+    return weights, tuple(window)
+
+
+def _load_interpolation_weights(key, cache_directory, comm):
+    if key in _interpolation_weights:
+        return _interpolation_weights[key]
+    if cache_directory is None:
+        return None
+    file_name = os.path.join(
+        cache_directory, f"weights_{key}_rank{comm.rank}.npz"
+    )
+    if not os.path.exists(file_name):
+        return None
+    stored = np.load(file_name)
+    weights = scipy.sparse.csr_matrix(
+        (stored["data"], stored["indices"], stored["indptr"]),
+        shape=tuple(stored["shape"]),
+    )
+    window = tuple(slice(int(a), int(b)) for a, b in stored["window"])
+    _interpolation_weights[key] = (weights, window)
+    return weights, window
+
+
+def _save_interpolation_weights(key, weights, window, cache_directory, comm):
+    _interpolation_weights[key] = (weights, window)
+    if cache_directory is None:
+        return
+    os.makedirs(cache_directory, exist_ok=True)
+    file_name = os.path.join(
+        cache_directory, f"weights_{key}_rank{comm.rank}.npz"
+    )
+    # Cores of different ensemble members with the same spatial rank write
+    # the same file, so each one writes its own copy and moves it into
+    # place, and readers never see a partially written file
+    temporary_name = (
+        os.path.splitext(file_name)[0] + f".tmp{fire.COMM_WORLD.rank}.npz"
+    )
+    np.savez(
+        temporary_name,
+        data=weights.data,
+        indices=weights.indices,
+        indptr=weights.indptr,
+        shape=np.array(weights.shape),
+        window=np.array([(s.start, s.stop) for s in window]),
+    )
+    os.replace(temporary_name, file_name)
+
+
+def interpolate(Model, fname, V, cache_directory=None):
     """Read and interpolate a seismic velocity model stored
-    in a HDF5 file onto the nodes of a finite element space.
+    in a HDF5 file, or directly from a two dimensional SEG-Y file, onto
+    the nodes of a finite element space.
+
+    Each rank only reads the hyperslab of the model that covers its
+    degrees of freedom. The interpolation weights are kept in memory and,
+    if a cache directory is given, saved for each rank, so interpolating
+    another model with the same grid onto the same mesh is a single
+    sparse product.
 
     Parameters
     ----------
     Model: spyro object
         Model options and parameters.
     fname: str
-        The name of the HDF5 file containing the seismic velocity model.
+        The name of the HDF5 or SEG-Y file containing the seismic velocity
+        model.
     V: Firedrake.FunctionSpace object
         The space of the finite elements.
+    cache_directory: str (optional)
+        Directory where the interpolation weights are stored.
 
     Returns
     -------
@@ -338,76 +688,58 @@ def interpolate(Model, fname, V):
 
     """
     sd = V.mesh().geometric_dimension()
+    if sd not in (2, 3):
+        raise NotImplementedError
     m = V.ufl_domain()
-    if Model.abc_active:
-        minz = -Model.length_z - Model.abc_pad_length
-        maxz = 0.0
-        minx = 0.0 - Model.abc_pad_length
-        maxx = Model.length_x + Model.abc_pad_length
-        miny = 0.0 - Model.abc_pad_length
-        maxy = Model.length_y + Model.abc_pad_length
-    else:
-        minz = -Model.length_z
-        maxz = 0.0
-        minx = 0.0
-        maxx = Model.length_x
-        miny = 0.0
-        maxy = Model.length_y
 
     W = fire.VectorFunctionSpace(m, V.ufl_element())
     coords = fire.interpolate(m.coordinates, W)
     # (z,x) or (z,x,y)
-    if sd == 2:
-        qp_z, qp_x = coords.dat.data[:, 0], coords.dat.data[:, 1]
-    elif sd == 3:
-        qp_z, qp_x, qp_y = (
-            coords.dat.data[:, 0],
-            coords.dat.data[:, 1],
-            coords.dat.data[:, 2],
-        )
-    else:
-        raise NotImplementedError
-
-    with h5py.File(fname, "r") as f:
-        Z = np.asarray(f.get("velocity_model")[()])
-
-        if sd == 2:
-            nrow, ncol = Z.shape
-            z = np.linspace(minz, maxz, nrow)
-            x = np.linspace(minx, maxx, ncol)
-
-            # make sure no out-of-bounds
-            qp_z2 = [
-                minz if z < minz else maxz if z > maxz else z for z in qp_z
-            ]
-            qp_x2 = [
-                minx if x < minx else maxx if x > maxx else x for x in qp_x
-            ]
+    bounds = _grid_bounds(Model)[:sd]
+    # make sure no out-of-bounds
+    points = np.clip(
+        coords.dat.data_ro[:, :sd],
+        [lower for lower, _ in bounds],
+        [upper for _, upper in bounds],
+    )
 
-            interpolant = RegularGridInterpolator((z, x), Z)
-            tmp = interpolant((qp_z2, qp_x2))
-        elif sd == 3:
-            nrow, ncol, ncol2 = Z.shape
-            z = np.linspace(minz, maxz, nrow)
-            x = np.linspace(minx, maxx, ncol)
-            y = np.linspace(miny, maxy, ncol2)
-
-            # make sure no out-of-bounds
-            qp_z2 = [
-                minz if z < minz else maxz if z > maxz else z for z in qp_z
-            ]
-            qp_x2 = [
-                minx if x < minx else maxx if x > maxx else x for x in qp_x
-            ]
-            qp_y2 = [
-                miny if y < miny else maxy if y > maxy else y for y in qp_y
+    if fname.endswith((".segy", ".sgy")):
+        if sd != 2:
+            raise ValueError("Only 2D velocity models can be read from SEG-Y.")
+        velocity_file = SegyVelocityModel(fname)
+    else:
+        velocity_file = h5py.File(fname, "r")
+
+    with velocity_file as f:
+        if isinstance(f, SegyVelocityModel):
+            dataset = f
+        else:
+            dataset = f["velocity_model"]
+        shape = dataset.shape
+        key = hashlib.sha1(points.tobytes())
+        key.update(repr((shape, bounds)).encode())
+        key = key.hexdigest()
+
+        cached = _load_interpolation_weights(key, cache_directory, m.comm)
+        if cached is None:
+            axes = [
+                np.linspace(lower, upper, n)
+                for (lower, upper), n in zip(bounds, shape)
             ]
-
-            interpolant = RegularGridInterpolator((z, x, y), Z)
-            tmp = interpolant((qp_z2, qp_x2, qp_y2))
+            weights, window = _interpolation_weights_for(points, axes)
+            _save_interpolation_weights(
+                key, weights, window, cache_directory, m.comm
+            )
+        else:
+            weights, window = cached
+
+        if weights.shape[1] > 0:
+            Z = np.asarray(dataset[window], dtype=float)
+        else:
+            Z = np.zeros(0)
 
     c = fire.Function(V)
-    c.dat.data[:] = tmp
+    c.dat.data[:] = weights @ Z.ravel()
     c = _check_units(c)
     return c
 
@@ -0,0 +1,119 @@
+import numpy as np
+from mpi4py import MPI
+from scipy.sparse import csr_matrix
+
+from ..receivers.dirac_delta_projector import Delta_projector
+
+
+class GridResampler(Delta_projector):
+    """Resamples Functions of a finite element space to a structured grid.
+
+    Each grid point is located in the mesh once and the element basis
+    functions are tabulated there, so that every later export is a
+    sparse product with the local nodal values plus a reduction across
+    the spatial communicator. Works for 2D and 3D meshes, in parallel.
+
+    Attributes
+    ----------
+    grid_axes: list of numpy.ndarray
+        Coordinates of the grid along each mesh direction.
+    grid_shape: tuple
+        Shape of the resampled arrays, as given by ``numpy.meshgrid``
+        with its default (Cartesian) indexing.
+    grid_coordinates: list of numpy.ndarray
+        Coordinates of the grid points, each with shape ``grid_shape``.
+    resampling_matrix: scipy.sparse.csr_matrix
+        Map from the nodal values (including halos) to the grid points
+        owned by this core.
+    """
+
+    def __init__(self, V, grid_spacing, buffer=0.01):
+        """
+        Parameters
+        ----------
+        V: firedrake.FunctionSpace
+            Scalar function space of the resampled Functions.
+        grid_spacing: float
+            Spacing of the grid points.
+        buffer: float (optional)
+            Distance between the grid and the bounding box of the mesh.
+        """
+        mesh = V.mesh()
+        self.mesh = mesh
+        self.space = V
+        self.my_ensemble = None
+        self.automatic_adjoint = False
+        self.dimension = mesh.geometric_dimension()
+        degree = V.ufl_element().degree()
+        if isinstance(degree, tuple):
+            degree = degree[0]
+        self.degree = degree
+        cell_name = mesh.ufl_cell().cellname()
+        self.quadrilateral = cell_name not in ("triangle", "tetrahedron")
+
+        self.cellIDs = None
+        self.cellVertices = None
+        self.cell_tabulations = None
+        self.cellNodeMaps = None
+        self.node_indices = None
+        self.injection_matrix = None
+        self.nodes_per_cell = None
+
+        coordinates = mesh.coordinates.dat.data_ro
+        comm = mesh.comm
+        self.grid_axes = []
+        for direction in range(self.dimension):
+            lower = comm.allreduce(np.amin(coordinates[:, direction]), op=MPI.MIN)
+            upper = comm.allreduce(np.amax(coordinates[:, direction]), op=MPI.MAX)
+            self.grid_axes.append(
+                np.arange(lower + buffer, upper - buffer, grid_spacing)
+            )
+        self.grid_coordinates = np.meshgrid(*self.grid_axes)
+        self.grid_shape = self.grid_coordinates[0].shape
+
+        self.point_locations = np.stack(
+            [axis.ravel() for axis in self.grid_coordinates], axis=1
+        )
+        self.number_of_points = len(self.point_locations)
+        self.is_local = [0] * self.number_of_points
+        self.build_maps()
+        self.resampling_matrix = self._build_resampling_matrix()
+
+    def _build_resampling_matrix(self):
+        # Points on the boundary between partitions are found by more than
+        # one core. Each point is assigned to the lowest rank that has it.
+        comm = self.mesh.comm
+        found = np.array([cell_id is not None for cell_id in self.is_local])
+        owner = np.where(found, comm.rank, comm.size)
+        comm.Allreduce(MPI.IN_PLACE, owner, op=MPI.MIN)
+        self.is_owned = owner == comm.rank
+        self.is_found = owner < comm.size
+
+        owned_points = np.flatnonzero(self.is_owned)
+        number_of_nodes = self.space.dof_dset.total_size
+        rows = np.repeat(owned_points, self.nodes_per_cell)
+        columns = self.node_indices[owned_points].ravel()
+        values = self.cell_tabulations[owned_points].ravel()
+        return csr_matrix(
+            (values, (rows, columns)),
+            shape=(self.number_of_points, number_of_nodes),
+        )
+
+    def resample(self, function):
+        """Values of a Function at the grid points. Points outside of the
+        mesh are NaN.
+
+        Parameters
+        ----------
+        function: firedrake.Function
+            Function in the space of the resampler.
+
+        Returns
+        -------
+        values: numpy.ndarray
+            Array with shape ``grid_shape``, the same on every core.
+        """
+        values = self.resampling_matrix @ function.dat.data_ro_with_halos
+        self.mesh.comm.Allreduce(MPI.IN_PLACE, values, op=MPI.SUM)
+        values[~self.is_found] = np.nan
+        return values.reshape(self.grid_shape)
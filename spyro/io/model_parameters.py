@@ -40,8 +40,15 @@ from .. import meshing
 # # Number of cores for the shot. For simplicity, we keep things serial.
 # # spyro however supports both spatial parallelism and "shot" parallelism.
 # default_dictionary["parallelism"] = {
-# # options: automatic (same number of cores for evey processor) or spatial
+# # options: automatic (same number of cores for evey processor), spatial
+# # or custom
 #     "type": "automatic",
+# # cores of each ensemble member, only for custom parallelism
+#     "custom_cores_per_shot": [],
+# # options: round_robin or dynamic (members take the next free shot)
+#     "shot_scheduling": "round_robin",
+# # prints the wall time of the forward and gradient of every shot
+#     "print_shot_times": False,
 # }
 
 # # Define the domain size without the PML. Here we'll assume a 0.75 x 1.50 km
@@ -59,12 +66,25 @@ from .. import meshing
 # default_dictionary["synthetic_data"] = {
 #     "real_mesh_file": None,
 #     "real_velocity_file": None,
+#     "velocity_model_cache_directory": None,  # saves interpolation weights
+# # and SEG-Y to HDF5 conversions
+#     "read_segy_directly": False,  # memory-mapped SEG-Y instead of HDF5
 # }
 # default_dictionary["inversion"] = {
 #     "perform_fwi": False, # switch to true to make a FWI
 #     "initial_guess_model_file": None,
-#     "shot_record_file": None,
+#     "shot_record_file": None,  # .npy file or shot record store directory
 #     "optimization_parameters": default_optimization_parameters,
+#     "evaluation_cache_size": 4,  # cached (functional, gradient) pairs
+# # l2, cross_correlation, envelope or trace_normalized
+#     "misfit_type": "l2",
+#     "misfit_time_window": None,  # (start, end) in seconds or time weights
+#     "misfit_receiver_weights": None,  # weight of each receiver
+# # None, random_sign or random_phase: all sources fired as one encoded
+# # supershot per ensemble member, with new codes every iteration
+#     "source_encoding": None,
+#     "source_encoding_seed": None,
+#     "iterations_per_encoding": 1,
 # }
 
 # # Specify a 250-m PML on the three sides of the
@@ -113,6 +133,12 @@ from .. import meshing
 #     "output_frequency": 100,
 # # how frequently to save solution to RAM
 #     "gradient_sampling_frequency": 100,
+#     "forward_storage": "memory",  # memory, checkpointing or disk
+#     "number_of_checkpoints": 10,  # only used with checkpointing
+#     "snapshot_directory": None,  # only used with disk
+#     "snapshot_compression": None,  # None, float32 or quantized
+#     "stability_check": "norm",  # norm, max or None
+#     "explicit_update": True,  # pre-assembled operators for lumped methods
 # }
 # default_dictionary["visualization"] = {
 #     "forward_output" : True,
@@ -162,6 +188,42 @@ class Model_parameters:
         Frequency of outputting the solution to pvd files.
     gradient_sampling_frequency: int
         Frequency of saving the solution to RAM.
+    forward_storage: str
+        How the sampled forward solution is kept for the gradient. Can be
+        "memory" (default) to store every sample or "checkpointing" to
+        store only a few states and recompute the samples with a binomial
+        (revolve) schedule during the adjoint propagation, or "disk" to
+        stream the samples to a per-rank memory-mapped file.
+    number_of_checkpoints: int
+        Number of checkpoints, besides the initial state, used when
+        forward_storage is "checkpointing".
+    snapshot_directory: str
+        Directory for the snapshot files when forward_storage is "disk".
+        Defaults to the system temporary directory.
+    asynchronous_snapshot_io: bool
+        Whether snapshot files are written behind and read ahead by a
+        background thread. Defaults to True.
+    snapshot_compression: str
+        Lossy compression of the stored forward snapshots. Can be None
+        (default), "float32" or "quantized" (error-bounded fixed-rate
+        quantization).
+    compression_tolerance: float
+        Pointwise error, relative to the maximum absolute value of each
+        snapshot, allowed by the "quantized" compression.
+    stability_check: str
+        How the solution is checked for numerical instability every
+        output_frequency timesteps. Can be "norm" (default) for the L2
+        norm, "max" for the maximum absolute nodal value, which is cheaper
+        but larger for concentrated wavefields, or None to disable the
+        check.
+    stability_threshold: float
+        Value above which the solution is considered unstable. Defaults
+        to 1.0.
+    explicit_update: bool
+        Whether mass lumped acoustic solvers without PML advance in time
+        with pre-assembled stiffness and inverse lumped mass operators,
+        instead of assembling the right hand side form every timestep.
+        Defaults to True.
     number_of_sources: int
         Number of sources used in the simulation.
     source_locations: list
@@ -178,7 +240,20 @@ class Model_parameters:
         List of receiver locations.
     parallelism_type: str
         Type of parallelism used in the simulation. Can be "automatic" for
-        automatic parallelism or "spatial" for spatial parallelism.
+        automatic parallelism, "spatial" for spatial parallelism or
+        "custom" for a given number of cores for each ensemble member.
+    shot_scheduling: str
+        How shots are assigned to ensemble members, "round_robin" or
+        "dynamic".
+    print_shot_times: bool
+        If True, each ensemble member prints the wall time of the forward
+        and gradient computation of every shot. Defaults to False.
+    custom_cores_per_shot: list of int
+        Number of cores of each ensemble member with "custom" parallelism.
+    source_encoding: str
+        None, "random_sign" or "random_phase". If set, the FWI fires all
+        sources at once as one encoded supershot per ensemble member, and
+        every member needs the observed records of all shots.
     mesh_file: str
         Path to the mesh file.
     length_z: float
@@ -209,6 +284,13 @@ class Model_parameters:
         Whether or not the simulation is a FWI.
     initial_velocity_model_file: str
         Path to the initial velocity model file.
+    velocity_model_cache_directory: str
+        Directory where the interpolation weights from velocity model
+        files to the mesh are saved. If None, they are only kept in
+        memory. Converted SEG-Y files are also stored there.
+    read_segy_directly: bool
+        Whether SEG-Y velocity models are read with memory-mapped trace
+        access instead of being converted to HDF5.
     fwi_output_folder: str
         Path to the FWI output folder.
     control_output_file: str
@@ -217,6 +299,10 @@ class Model_parameters:
         Path to the gradient output file.
     optimization_parameters: dict
         Dictionary of the optimization parameters.
+    shot_record_file: str
+        Observed shot records, either a .npy file or a shot record store
+        directory, from which only the shot of each ensemble member is
+        read.
     automatic_adjoint: bool
         Whether or not the adjoint is calculated automatically.
     forward_output: bool
@@ -295,6 +381,7 @@ class Model_parameters:
 
         # Checks inversion variables, FWI and velocity model inputs and outputs
         self.real_shot_record = None
+        self.shot_record_file = None
         self._sanitize_optimization_and_velocity()
 
         # Checking mesh_parameters
@@ -320,6 +407,9 @@ class Model_parameters:
         # Setting up MPI communicator and checking parallelism:
         self._sanitize_comm(comm)
 
+        # Loads the observed shot record of this ensemble member
+        self._load_real_shot_record()
+
         # Check automatic adjoint
         self._sanitize_automatic_adjoint()
 
@@ -500,19 +590,55 @@ class Model_parameters:
         dictionary = self.input_dictionary
         if "parallelism" in dictionary:
             self.parallelism_type = dictionary["parallelism"]["type"]
+            self.shot_scheduling = dictionary["parallelism"].get(
+                "shot_scheduling", "round_robin"
+            )
+            self.custom_cores_per_shot = dictionary["parallelism"].get(
+                "custom_cores_per_shot", []
+            )
+            self.print_shot_times = dictionary["parallelism"].get(
+                "print_shot_times", False
+            )
         else:
             warnings.warn("No paralellism type listed. Assuming automatic")
             self.parallelism_type = "automatic"
+            self.shot_scheduling = "round_robin"
+            self.custom_cores_per_shot = []
+            self.print_shot_times = False
 
         if self.source_type == "MMS":
             self.parallelism_type = "spatial"
 
+        if self.parallelism_type == "custom" and len(
+            self.custom_cores_per_shot
+        ) > self.number_of_sources:
+            raise ValueError(
+                "There are more custom ensemble members than shots."
+            )
+
         if comm is None:
             self.comm = utils.mpi_init(self)
             self.comm.comm.barrier()
         else:
             self.comm = comm
 
+    def _load_real_shot_record(self):
+        shot_record_file = self.shot_record_file
+        if shot_record_file is None:
+            return
+        if io.shot_store.ShotRecordStore.is_store(shot_record_file):
+            store = io.shot_store.ShotRecordStore(shot_record_file)
+            if io.shot_scheduler.needs_all_shot_records(self):
+                # Shots are read when they are scheduled or encoded
+                self.real_shot_record = store
+                return
+            for snum in range(self.number_of_sources):
+                if io.is_owner(self.comm, snum):
+                    self.real_shot_record = store.read(snum)
+                    break
+        else:
+            self.real_shot_record = np.load(shot_record_file)
+
     def _sanitize_acquisition(self):
         dictionary = self.input_dictionary["acquisition"]
         self.number_of_receivers = len(dictionary["receiver_locations"])
@@ -561,6 +687,14 @@ class Model_parameters:
         if dictionary["inversion"]["perform_fwi"]:
             self.running_fwi = True
 
+        self.source_encoding = dictionary["inversion"].get(
+            "source_encoding", None
+        )
+        if self.source_encoding not in (None, "random_sign", "random_phase"):
+            raise ValueError(
+                f"Source encoding {self.source_encoding} not supported."
+            )
+
         if self.running_fwi:
             self._sanitize_optimization_and_velocity_for_fwi()
         else:
@@ -581,6 +715,13 @@ class Model_parameters:
                 "velocity_conditional"
             ]
 
+        self.velocity_model_cache_directory = dictionary["synthetic_data"].get(
+            "velocity_model_cache_directory", None
+        )
+        self.read_segy_directly = dictionary["synthetic_data"].get(
+            "read_segy_directly", False
+        )
+
         self.forward_output_file = "results/forward_output.pvd"
 
     def _sanitize_optimization_and_velocity_for_fwi(self):
@@ -616,9 +757,7 @@ class Model_parameters:
             }
             self.optimization_parameters = default_optimization_parameters
 
-        if "shot_record_file" in dictionary["inversion"]:
-            if dictionary["inversion"]["shot_record_file"] is not None:
-                self.real_shot_record = np.load(dictionary["inversion"]["shot_record_file"])
+        self.shot_record_file = dictionary["inversion"].get("shot_record_file", None)
 
     def _sanitize_optimization_and_velocity_without_fwi(self):
         dictionary = self.input_dictionary
@@ -642,8 +781,27 @@ class Model_parameters:
         self.gradient_sampling_frequency = dictionary[
             "gradient_sampling_frequency"
         ]
+        self.forward_storage = dictionary.get("forward_storage", "memory")
+        self.number_of_checkpoints = dictionary.get(
+            "number_of_checkpoints", 10
+        )
+        self.snapshot_directory = dictionary.get("snapshot_directory", None)
+        self.asynchronous_snapshot_io = dictionary.get(
+            "asynchronous_snapshot_io", True
+        )
+        self.snapshot_compression = dictionary.get(
+            "snapshot_compression", None
+        )
+        self.compression_tolerance = dictionary.get(
+            "compression_tolerance", 1e-3
+        )
+        self.stability_check = dictionary.get("stability_check", "norm")
+        self.stability_threshold = dictionary.get("stability_threshold", 1.0)
+        self.explicit_update = dictionary.get("explicit_update", True)
 
         self.__check_time()
+        self.__check_forward_storage()
+        self.__check_stability()
 
     def __check_acquisition(self):
         for source in self.source_locations:
@@ -666,6 +824,37 @@ class Model_parameters:
                     attemps to propagate wave."
             )
 
+    def __check_forward_storage(self):
+        accepted_storages = ["memory", "checkpointing", "disk"]
+        if self.forward_storage not in accepted_storages:
+            raise ValueError(
+                f"Forward storage of {self.forward_storage} not valid. "
+                f"Please use one of {accepted_storages}."
+            )
+        if self.forward_storage == "checkpointing":
+            if self.number_of_checkpoints < 0:
+                raise ValueError(
+                    "Number of checkpoints has to be non-negative."
+                )
+            if self.snapshot_compression is not None:
+                raise ValueError(
+                    "Snapshot compression is not used with checkpointing."
+                )
+        accepted_compressions = [None, "float32", "quantized"]
+        if self.snapshot_compression not in accepted_compressions:
+            raise ValueError(
+                f"Snapshot compression of {self.snapshot_compression} not "
+                f"valid. Please use one of {accepted_compressions}."
+            )
+
+    def __check_stability(self):
+        accepted_checks = [None, "max", "norm"]
+        if self.stability_check not in accepted_checks:
+            raise ValueError(
+                f"Stability check of {self.stability_check} not valid. "
+                f"Please use one of {accepted_checks}."
+            )
+
     def set_mesh(
         self,
         user_mesh=None,
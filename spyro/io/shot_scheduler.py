@@ -0,0 +1,139 @@
+import numpy as np
+from mpi4py import MPI
+
+
+class ShotScheduler:
+    """Assigns the shots of an acquisition to the members of an ensemble,
+    so that any number of shots can be run by any number of ensemble
+    members.
+
+    In "round_robin" mode, member ``k`` of ``n`` runs the shots ``k``,
+    ``k + n``, ``k + 2n``, and so on. In "dynamic" mode, the members take
+    the next shot from a shared counter whenever they finish one, so
+    that faster members run more shots. The counter is an MPI window on
+    the first core of the ensemble communicator.
+
+    Attributes
+    ----------
+    comm: firedrake.Ensemble
+        Ensemble communicator.
+    number_of_shots: int
+        Number of shots in the acquisition.
+    mode: str
+        "round_robin" or "dynamic".
+    shots: list
+        Shots run by this ensemble member so far.
+    """
+
+    def __init__(self, comm, number_of_shots, mode="round_robin"):
+        if mode not in ("round_robin", "dynamic"):
+            raise ValueError(f"Shot scheduling {mode} not supported.")
+        self.comm = comm
+        self.number_of_shots = number_of_shots
+        self.mode = mode
+        self.shots = []
+
+    def __iter__(self):
+        self.shots = []
+        if self.mode == "round_robin":
+            ensemble_comm = self.comm.ensemble_comm
+            for shot in range(
+                ensemble_comm.rank, self.number_of_shots, ensemble_comm.size
+            ):
+                self.shots.append(shot)
+                yield shot
+        else:
+            yield from self._dynamic_shots()
+
+    def _dynamic_shots(self):
+        # Only the first core of each member takes shots, the others
+        # follow it
+        is_leader = self.comm.comm.rank == 0
+        counter = np.zeros(1, dtype=np.int64)
+        window = None
+        if is_leader:
+            leaders_comm = _leaders_comm(self.comm)
+            window = MPI.Win.Create(
+                counter if leaders_comm.rank == 0 else None,
+                disp_unit=counter.itemsize,
+                comm=leaders_comm,
+            )
+            leaders_comm.barrier()
+
+        increment = np.ones(1, dtype=np.int64)
+        shot = np.zeros(1, dtype=np.int64)
+        try:
+            while True:
+                if is_leader:
+                    window.Lock(0)
+                    window.Fetch_and_op(increment, shot, 0, 0, MPI.SUM)
+                    window.Unlock(0)
+                self.comm.comm.Bcast(shot, root=0)
+                if shot[0] >= self.number_of_shots:
+                    break
+                self.shots.append(int(shot[0]))
+                yield int(shot[0])
+        finally:
+            if window is not None:
+                window.Free()
+
+    def gather_records(self, records):
+        """Collects the records of every shot on every core.
+
+        Parameters
+        ----------
+        records: dict
+            Receiver records of the shots run by this member, by shot.
+
+        Returns
+        -------
+        all_records: numpy.ndarray
+            Records with shape (number of shots, timesteps, receivers).
+        """
+        shape = None
+        for record in records.values():
+            shape = np.shape(record)
+        # Members without shots do not know the record shape
+        shapes = self.comm.ensemble_comm.allgather(shape)
+        shape = next(shape for shape in shapes if shape is not None)
+
+        all_records = np.zeros((self.number_of_shots,) + tuple(shape))
+        for shot, record in records.items():
+            all_records[shot] = record
+        # Each shot is run by exactly one member
+        self.comm.ensemble_comm.Allreduce(MPI.IN_PLACE, all_records, op=MPI.SUM)
+        return all_records
+
+
+def _leaders_comm(comm):
+    """Communicator of the first core of each ensemble member. For a
+    Firedrake Ensemble, it is the ensemble communicator of those cores."""
+    ensemble_comm = comm.ensemble_comm
+    return getattr(ensemble_comm, "leaders_comm", ensemble_comm)
+
+
+def fires_encoded_supershot(wave):
+    """Whether all sources are fired at once, as one encoded supershot
+    per ensemble member."""
+    sources = getattr(wave, "sources", None)
+    return sources is not None and sources.source_signals is not None
+
+
+def has_multiple_shots_per_member(wave):
+    """Whether ensemble members may run more than one shot. With dynamic
+    scheduling the shots of a member are only known at run time, so any
+    member may run several of them."""
+    if fires_encoded_supershot(wave):
+        return False
+    if getattr(wave, "shot_scheduling", "round_robin") == "dynamic":
+        return True
+    return wave.number_of_sources > wave.comm.ensemble_comm.size
+
+
+def needs_all_shot_records(wave):
+    """Whether every ensemble member needs the observed records of every
+    shot, either to run any scheduled shot or to encode supershots."""
+    return (
+        has_multiple_shots_per_member(wave)
+        or getattr(wave, "source_encoding", None) is not None
+    )
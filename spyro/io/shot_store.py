@@ -0,0 +1,159 @@
+import json
+import os
+
+import numpy as np
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ShotRecordStore:
+    """Directory with the shot records of an acquisition, stored as
+    ``(number_of_shots, number_of_timesteps, number_of_receivers)``
+    binary data described by a JSON manifest.
+
+    Without compression, the records are kept in a single ``.npy`` file
+    that is memory-mapped, so each ensemble owner writes its shots in
+    place and a reader only touches the shots (and receivers) it
+    slices. With compression, each shot is a separate compressed ``.npz``
+    file. Records are read back in double precision.
+
+    Attributes
+    ----------
+    directory: str
+        Directory of the store.
+    shape: tuple
+        Number of shots, timesteps and receivers.
+    dtype: numpy.dtype
+        Storage precision.
+    compression: str or None
+        None or "zlib".
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+        self.shape = tuple(manifest["shape"])
+        self.dtype = np.dtype(manifest["dtype"])
+        self.compression = manifest["compression"]
+        self._data = None
+
+    @staticmethod
+    def is_store(path):
+        """Whether ``path`` is a shot record store directory."""
+        return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+    @classmethod
+    def create(
+        cls,
+        directory,
+        shape,
+        dtype=np.float32,
+        compression=None,
+        comm=None,
+    ):
+        """Creates an empty store. If an MPI communicator is given, the
+        store is created by its first core and opened by all of them.
+
+        Parameters
+        ----------
+        directory: str
+            Directory of the store.
+        shape: tuple
+            Number of shots, timesteps and receivers.
+        dtype: numpy.dtype
+            Storage precision. Default is single precision.
+        compression: str or None
+            None or "zlib".
+        comm: MPI communicator (optional)
+            Communicator of every core that writes to the store.
+        """
+        if compression not in (None, "zlib"):
+            raise ValueError(f"Shot record compression {compression} not supported.")
+
+        if comm is None or comm.rank == 0:
+            os.makedirs(directory, exist_ok=True)
+            if compression is None:
+                np.lib.format.open_memmap(
+                    os.path.join(directory, "shots.npy"),
+                    mode="w+",
+                    dtype=dtype,
+                    shape=tuple(shape),
+                ).flush()
+            manifest = {
+                "shape": [int(n) for n in shape],
+                "dtype": np.dtype(dtype).name,
+                "compression": compression,
+            }
+            with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+                json.dump(manifest, f)
+        if comm is not None:
+            comm.barrier()
+
+        return cls(directory)
+
+    @property
+    def number_of_shots(self):
+        return self.shape[0]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _memmap(self, mode):
+        if self._data is None or self._data.mode != mode:
+            self._data = np.load(
+                os.path.join(self.directory, "shots.npy"), mmap_mode=mode
+            )
+        return self._data
+
+    def _shot_file(self, shot):
+        return os.path.join(self.directory, f"shot_{shot}.npz")
+
+    def write(self, shot, record):
+        """Writes the record of a shot, with shape (timesteps, receivers)."""
+        record = np.asarray(record)
+        if record.shape != self.shape[1:]:
+            raise ValueError(
+                f"Shot record with shape {record.shape} does not fit a store "
+                f"of records with shape {self.shape[1:]}."
+            )
+        if self.compression is None:
+            data = self._memmap("r+")
+            data[shot] = record
+            data.flush()
+        else:
+            np.savez_compressed(
+                self._shot_file(shot), record=record.astype(self.dtype)
+            )
+
+    def read(self, shot, receivers=None):
+        """Reads the record of a shot, optionally only some receivers.
+
+        Parameters
+        ----------
+        shot: int
+            Shot number.
+        receivers: slice or array of int (optional)
+            Receivers to read. Default is all of them.
+
+        Returns
+        -------
+        record: numpy.ndarray
+            Double precision record with shape (timesteps, receivers).
+        """
+        if receivers is None:
+            receivers = slice(None)
+        if self.compression is None:
+            record = self._memmap("r")[shot][:, receivers]
+        else:
+            with np.load(self._shot_file(shot)) as f:
+                record = f["record"][:, receivers]
+        return np.array(record, dtype=np.float64)
+
+    def __getitem__(self, shot):
+        if shot < 0:
+            shot += self.shape[0]
+        if shot < 0 or shot >= self.shape[0]:
+            raise IndexError("Shot number out of range")
+        return self.read(shot)
@@ -35,6 +35,9 @@ class Receivers(Delta_projector):
     is_local: list of booleans
         List that checks if receivers are present in cores
         spatial paralelism
+    injection_matrix: scipy.sparse.csr_matrix
+        Transpose of the receiver interpolation operator, built on the
+        first adjoint injection
 
     Methods
     -------
@@ -96,16 +99,12 @@ class Receivers(Delta_projector):
         rhs_forcing: object
             Firedrake assembled right hand side operator with injected values
         """
-        for rid in range(self.number_of_points):
-            value = residual[IT][rid]
-            if self.is_local[rid]:
-                idx = np.int_(self.cellNodeMaps[rid])
-                phis = self.cell_tabulations[rid]
-
-                tmp = np.dot(phis, value)
-                rhs_forcing.dat.data_with_halos[idx] += tmp
-            else:
-                tmp = rhs_forcing.dat.data_with_halos[0]
+        data = rhs_forcing.dat.data_with_halos
+        if self.injection_matrix is None:
+            self.injection_matrix = self.adjoint_interpolation_matrix(
+                data.shape[0]
+            )
+        data[:] += self.injection_matrix @ np.asarray(residual[IT])
 
         return rhs_forcing
 
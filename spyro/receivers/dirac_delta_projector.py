@@ -18,6 +18,7 @@ from .changing_coordinates import (
 )
 
 import numpy as np
+from scipy.sparse import csr_matrix
 
 
 class Delta_projector:
@@ -48,12 +49,18 @@ class Delta_projector:
         List of tabulations for each point in a cell
     cellNodeMaps: list
         List of node maps for each cell
+    node_indices: numpy.ndarray
+        Integer array of shape (number_of_points, nodes_per_cell) with the
+        node maps, used for batched interpolation
     nodes_per_cell: int
         Number of nodes per cell
     quadrilateral: bool
         True if mesh is quadrilateral
     is_local: list
         List of cell IDs local to the processor
+    injection_matrix: scipy.sparse.csr_matrix
+        Cached transpose of the interpolation operator, used to inject
+        values at the points
     """
     def __init__(self, wave_object):
         """
@@ -78,6 +85,8 @@ class Delta_projector:
         self.cellVertices = None
         self.cell_tabulations = None
         self.cellNodeMaps = None
+        self.node_indices = None
+        self.injection_matrix = None
         self.nodes_per_cell = None
         if wave_object.cell_type == "quadrilateral":
             self.quadrilateral = True
@@ -114,6 +123,8 @@ class Delta_projector:
             self.cellVertices,
             self.cellNodeMaps,
         ) = self.__point_locator()
+        self.node_indices = np.asarray(self.cellNodeMaps, dtype=np.int64)
+        self.injection_matrix = None
         self.cell_tabulations = self.__func_build_cell_tabulations(order)
 
         self.number_of_points = len(self.point_locations)
@@ -129,11 +140,44 @@ class Delta_projector:
 
         Returns
         -------
-        solution_at_receivers: list
-            Solution interpolated to the list of receiver coordinates
-            for the given timestep.
+        solution_at_receivers: numpy.ndarray
+            Solution interpolated to the receiver coordinates for the given
+            timestep, with shape (number_of_points,) for scalar fields and
+            (number_of_points, dimension) for vector fields.
         """
-        return [self.new_at(field, rn) for rn in range(self.number_of_points)]
+        # Points that are not local have zeroed node maps and tabulations
+        return np.einsum(
+            "rn,rn...->r...", self.cell_tabulations, field[self.node_indices]
+        )
+
+    def adjoint_interpolation_matrix(self, number_of_nodes):
+        """Builds the transpose of the point interpolation operator, i.e.
+        the operator that injects one value per point into the nodes of
+        the cells containing them. Only points local to this core are
+        included.
+
+        Parameters
+        ----------
+        number_of_nodes: int
+            Number of nodes (including halos) of the function space.
+
+        Returns
+        -------
+        matrix: scipy.sparse.csr_matrix
+            Sparse matrix of shape (number_of_nodes, number_of_points).
+        """
+        local_points = np.array(
+            [point for point, cell_id in enumerate(self.is_local)
+             if cell_id is not None],
+            dtype=np.int64,
+        )
+        rows = self.node_indices[local_points].ravel()
+        columns = np.repeat(local_points, self.nodes_per_cell)
+        values = self.cell_tabulations[local_points].ravel()
+        return csr_matrix(
+            (values, (rows, columns)),
+            shape=(number_of_nodes, self.number_of_points),
+        )
 
     def new_at(self, udat, receiver_id):
         """Function that evaluates the receiver value given its id.
@@ -153,7 +197,7 @@ class Delta_projector:
 
         if self.is_local is not None:
             # Getting relevant receiver points
-            u = udat[np.int_(self.cellNodeMaps[receiver_id, :])]
+            u = udat[self.node_indices[receiver_id, :]]
         else:
             return udat[0]  # junk receiver isn't local
 
@@ -1,6 +1,8 @@
 import firedrake as fire
 from firedrake import dx, Constant, dot, grad
 
+from .state_ring import StateRing
+
 
 def construct_solver_or_matrix_no_pml(Wave_object):
     """Builds solver operators for wave object without a PML. Doesn't create mass matrices if
@@ -56,3 +58,73 @@ def construct_solver_or_matrix_no_pml(Wave_object):
 
     Wave_object.rhs = rhs
     Wave_object.B = B
+    Wave_object.state_ring = StateRing(rhs, u_nm1, u_n, u_np1)
+
+    Wave_object.stiffness_matrix = None
+    Wave_object.inverse_mass_diagonal = None
+    if (
+        Wave_object.explicit_update
+        and q is None
+        and is_diagonal_solver(Wave_object.solver_parameters)
+    ):
+        construct_explicit_operators(Wave_object, lhs)
+
+
+def is_diagonal_solver(solver_parameters):
+    """Whether the linear solver only scales by the inverse of the matrix
+    diagonal, which is the case for mass lumped methods.
+
+    Parameters
+    ----------
+    solver_parameters: dict or None
+        PETSc solver parameters of the wave object
+    """
+    if solver_parameters is None:
+        return False
+    return (
+        solver_parameters.get("ksp_type") == "preonly"
+        and solver_parameters.get("pc_type") == "jacobi"
+    )
+
+
+def construct_explicit_operators(Wave_object, lhs):
+    """Pre-assembles the stiffness matrix and the inverse of the (lumped)
+    left hand side diagonal, so that each timestep is computed as
+    ``u_np1 = 2 u_n - u_nm1 + D^-1 (f - K u_n)`` without assembling the
+    right hand side form.
+
+    Parameters
+    ----------
+    Wave_object: :class: 'Wave' object
+        Waveform object that contains all simulation parameters
+    lhs: ufl.Form
+        Bilinear form of the mass term, scaled by 1/(c^2 dt^2)
+    """
+    V = Wave_object.function_space
+    quad_rule = Wave_object.quadrature_rule
+    u = fire.TrialFunction(V)
+    v = fire.TestFunction(V)
+
+    K = fire.assemble(
+        dot(grad(u), grad(v)) * dx(scheme=quad_rule), mat_type="aij"
+    )
+    Wave_object.stiffness_matrix = K.petscmat
+    Wave_object.inverse_mass_diagonal = fire.Function(V)
+    update_inverse_mass_diagonal(Wave_object, lhs)
+
+
+def update_inverse_mass_diagonal(Wave_object, lhs):
+    """Recomputes the inverse of the (lumped) left hand side diagonal used
+    by the explicit update, e.g. after the velocity model changed.
+
+    Parameters
+    ----------
+    Wave_object: :class: 'Wave' object
+        Waveform object that contains all simulation parameters
+    lhs: ufl.Form
+        Bilinear form of the mass term, scaled by 1/(c^2 dt^2)
+    """
+    M = fire.assemble(lhs, mat_type="aij")
+    with Wave_object.inverse_mass_diagonal.dat.vec_wo as diagonal:
+        M.petscmat.getDiagonal(diagonal)
+        diagonal.reciprocal()
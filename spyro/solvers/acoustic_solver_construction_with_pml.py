@@ -2,6 +2,7 @@ import firedrake as fire
 from firedrake import dx, ds, Constant, dot, grad, inner
 
 from ..pml import damping
+from .state_ring import StateRing
 
 
 def construct_solver_or_matrix_with_pml(Wave_object):
@@ -36,6 +37,7 @@ def construct_solver_or_matrix_with_pml_2d(Wave_object):
     X = fire.Function(W)
     X_n = fire.Function(W)
     X_nm1 = fire.Function(W)
+    X_np1 = fire.Function(W)
 
     u_n, pp_n = X_n.split()
     u_nm1, _ = X_nm1.split()
@@ -44,6 +46,7 @@ def construct_solver_or_matrix_with_pml_2d(Wave_object):
     Wave_object.X = X
     Wave_object.X_n = X_n
     Wave_object.X_nm1 = X_nm1
+    Wave_object.X_np1 = X_np1
 
     sigma_x, sigma_z = damping.functions(Wave_object)
     Gamma_1, Gamma_2 = damping.matrices_2D(sigma_z, sigma_x)
@@ -80,6 +83,7 @@ def construct_solver_or_matrix_with_pml_2d(Wave_object):
     Wave_object.solver = solver
     Wave_object.rhs = rhs_
     Wave_object.B = B
+    Wave_object.state_ring = StateRing(rhs_, X_nm1, X_n, X_np1)
 
 
 def construct_solver_or_matrix_with_pml_3d(Wave_object):
@@ -103,6 +107,7 @@ def construct_solver_or_matrix_with_pml_3d(Wave_object):
     X = fire.Function(W)
     X_n = fire.Function(W)
     X_nm1 = fire.Function(W)
+    X_np1 = fire.Function(W)
 
     u_n, psi_n, pp_n = X_n.split()
     u_nm1, psi_nm1, _ = X_nm1.split()
@@ -111,6 +116,7 @@ def construct_solver_or_matrix_with_pml_3d(Wave_object):
     Wave_object.X = X
     Wave_object.X_n = X_n
     Wave_object.X_nm1 = X_nm1
+    Wave_object.X_np1 = X_np1
 
     sigma_x, sigma_y, sigma_z = damping.functions(Wave_object)
     Gamma_1, Gamma_2, Gamma_3 = damping.matrices_3D(sigma_x, sigma_y, sigma_z)
@@ -166,5 +172,6 @@ def construct_solver_or_matrix_with_pml_3d(Wave_object):
     Wave_object.solver = solver
     Wave_object.rhs = rhs_
     Wave_object.B = B
+    Wave_object.state_ring = StateRing(rhs_, X_nm1, X_n, X_np1)
 
     return
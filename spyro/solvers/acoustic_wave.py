@@ -3,9 +3,10 @@ import warnings
 
 from .wave import Wave
 
-from ..io.basicio import ensemble_gradient
+from ..io.basicio import ensemble_gradient, convert_segy_to_hdf5, interpolate
 from .acoustic_solver_construction_no_pml import (
     construct_solver_or_matrix_no_pml,
+    update_inverse_mass_diagonal,
 )
 from .acoustic_solver_construction_with_pml import (
     construct_solver_or_matrix_with_pml,
@@ -31,9 +32,19 @@ class AcousticWave(Wave):
         """Builds solver operators. Doesn't create mass matrices if
         matrix_free option is on,
         which it is by default.
+
+        If the operators were already built for the same function space,
+        timestep, boundary layer and velocity Function (e.g. when only the
+        velocity values change between FWI iterations), they are reused
+        and only the states are reset.
         """
         self.current_time = 0.0
 
+        operator_key = self._get_operator_key()
+        if self._operators_match(operator_key):
+            self._reset_operators()
+            return
+
         abc_type = self.abc_boundary_layer_type
 
         # Just to document variables that will be overwritten
@@ -45,6 +56,9 @@ class AcousticWave(Wave):
         self.solver = None
         self.rhs = None
         self.B = None
+        self.stiffness_matrix = None
+        self.inverse_mass_diagonal = None
+        self.state_ring = None
         if abc_type is None:
             construct_solver_or_matrix_no_pml(self)
         elif abc_type == "PML":
@@ -57,6 +71,44 @@ class AcousticWave(Wave):
             self.X_np1 = fire.Function(V * Z)
             construct_solver_or_matrix_with_pml(self)
 
+        self.operator_key = operator_key
+
+    def _get_operator_key(self):
+        """Objects and parameters the solver operators depend on. The
+        velocity model is compared by identity, since its values are read
+        by the forms when they are assembled."""
+        return (
+            (self.function_space, self.c, self.source_expression),
+            (
+                float(self.dt),
+                self.abc_boundary_layer_type,
+                self.explicit_update,
+                str(self.solver_parameters),
+            ),
+        )
+
+    def _operators_match(self, operator_key):
+        if self.operator_key is None or self.state_ring is None:
+            return False
+        objects, parameters = self.operator_key
+        new_objects, new_parameters = operator_key
+        same_objects = all(
+            old is new for old, new in zip(objects, new_objects)
+        )
+        return same_objects and parameters == new_parameters
+
+    def _reset_operators(self):
+        """Resets the states of reused operators and refreshes the parts
+        that depend on the velocity values: the Jacobi preconditioner of
+        the solver and the lumped mass of the explicit update."""
+        for state in self.state_ring.states:
+            state.assign(0.0)
+        self.solver = fire.LinearSolver(
+            self.solver.A, solver_parameters=self.solver_parameters
+        )
+        if self.inverse_mass_diagonal is not None:
+            update_inverse_mass_diagonal(self, self.lhs)
+
     @ensemble_gradient
     def gradient_solve(self, guess=None, misfit=None, forward_solution=None):
         """Solves the adjoint problem to calculate de gradient.
@@ -94,21 +146,23 @@ class AcousticWave(Wave):
             if self.initial_velocity_model_file is None:
                 raise ValueError("No velocity model or velocity file to load.")
 
-            if self.initial_velocity_model_file.endswith(".segy"):
-                vp_filename, vp_filetype = os.path.splitext(
-                    self.initial_velocity_model_file
-                )
-                warnings.warn("Converting segy file to hdf5")
-                write_velocity_model(
-                    self.initial_velocity_model_file, ofname=vp_filename
+            if (
+                self.initial_velocity_model_file.endswith(".segy")
+                and not self.read_segy_directly
+            ):
+                self.initial_velocity_model_file = convert_segy_to_hdf5(
+                    self.initial_velocity_model_file,
+                    cache_directory=self.velocity_model_cache_directory,
                 )
-                self.initial_velocity_model_file = vp_filename + ".hdf5"
 
-            if self.initial_velocity_model_file.endswith((".hdf5", ".h5")):
+            if self.initial_velocity_model_file.endswith(
+                (".hdf5", ".h5", ".segy")
+            ):
                 self.initial_velocity_model = interpolate(
                     self,
                     self.initial_velocity_model_file,
                     self.function_space.sub(0),
+                    cache_directory=self.velocity_model_cache_directory,
                 )
 
             if self.debug_output:
@@ -160,6 +214,18 @@ class AcousticWave(Wave):
         else:
             return self.u_np1
     
+    @override
+    def _set_state_references(self, prev_vstate, vstate, next_vstate):
+        if self.abc_boundary_layer_type == "PML":
+            self.X_nm1 = prev_vstate
+            self.X_n = vstate
+            self.X_np1 = next_vstate
+            self.u_n = vstate.split()[0]
+        else:
+            self.u_nm1 = prev_vstate
+            self.u_n = vstate
+            self.u_np1 = next_vstate
+
     @override
     def get_receivers_output(self):
         if self.abc_boundary_layer_type == "PML":
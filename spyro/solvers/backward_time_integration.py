@@ -2,7 +2,79 @@ import firedrake as fire
 from . import helpers
 
 
-def backward_wave_propagator(Wave_obj, dt=None):
+class GradientAccumulator:
+    """Sums the gradient samples of the adjoint propagation.
+
+    The gradient is the solution of a mass matrix problem whose right hand
+    side is a weighted sum of the sampled integrands. Since the mass
+    matrix is constant, the assembled right hand sides are accumulated and
+    the mass solve is done only once, at the end. Setting ``accumulate``
+    to False solves the mass problem for every sample instead, as done
+    originally.
+
+    Attributes
+    ----------
+    rhs_form: ufl.Form
+        Linear form of one gradient sample.
+    accumulate: bool
+        Whether to accumulate the right hand sides before the mass solve.
+    dJ: firedrake.Function
+        Gradient, only complete after ``get_gradient``.
+    """
+
+    def __init__(self, Wave_obj, rhs_form, accumulate=True):
+        V = Wave_obj.function_space
+        m_u = fire.TrialFunction(V)
+        m_v = fire.TestFunction(V)
+        mgrad = m_u * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
+
+        self.rhs_form = rhs_form
+        self.accumulate = accumulate
+        self.dJ = fire.Function(V)  # , name="gradient")
+
+        if accumulate:
+            self.sample = fire.Cofunction(V.dual())
+            self.gradient_rhs = fire.Cofunction(V.dual())
+            A = fire.assemble(mgrad, mat_type="matfree")
+            self.solver = fire.LinearSolver(
+                A,
+                solver_parameters={
+                    "ksp_type": "preonly",
+                    "pc_type": "jacobi",
+                },
+            )
+        else:
+            self.gradi = fire.Function(V)
+            grad_prob = fire.LinearVariationalProblem(
+                mgrad, rhs_form, self.gradi
+            )
+            self.solver = fire.LinearVariationalSolver(
+                grad_prob,
+                solver_parameters={
+                    "ksp_type": "preonly",
+                    "pc_type": "jacobi",
+                    "mat_type": "matfree",
+                },
+            )
+
+    def add_sample(self, weight):
+        """Adds the current gradient sample, evaluated with the current
+        values of the form coefficients, multiplied by ``weight``."""
+        if self.accumulate:
+            fire.assemble(self.rhs_form, tensor=self.sample)
+            self.gradient_rhs.dat.data[:] += weight * self.sample.dat.data_ro
+        else:
+            self.solver.solve()
+            self.dJ += weight * self.gradi
+
+    def get_gradient(self):
+        """Returns the summed gradient."""
+        if self.accumulate:
+            self.solver.solve(self.dJ, self.gradient_rhs)
+        return self.dJ
+
+
+def backward_wave_propagator(Wave_obj, dt=None, accumulate_gradient=True):
     """Propagates the adjoint wave backwards in time.
     Currently uses central differences.
 
@@ -13,6 +85,9 @@ def backward_wave_propagator(Wave_obj, dt=None):
     dt: Python 'float' (optional)
         Time step to be used explicitly. If not mentioned uses the default,
         that was estabilished in the wave object for the adjoint model.
+    accumulate_gradient: bool (optional)
+        If True (default), accumulates the gradient samples and solves the
+        mass problem once. Otherwise solves it for every sample.
 
     Returns:
     --------
@@ -20,12 +95,16 @@ def backward_wave_propagator(Wave_obj, dt=None):
         Calculated gradient
     """
     if Wave_obj.abc_active is False:
-        return backward_wave_propagator_no_pml(Wave_obj, dt=dt)
+        return backward_wave_propagator_no_pml(
+            Wave_obj, dt=dt, accumulate_gradient=accumulate_gradient
+        )
     elif Wave_obj.abc_active:
-        return mixed_space_backward_wave_propagator(Wave_obj, dt=dt)
+        return mixed_space_backward_wave_propagator(
+            Wave_obj, dt=dt, accumulate_gradient=accumulate_gradient
+        )
 
 
-def backward_wave_propagator_no_pml(Wave_obj, dt=None):
+def backward_wave_propagator_no_pml(Wave_obj, dt=None, accumulate_gradient=True):
     """Propagates the adjoint wave backwards in time.
     Currently uses central differences. Does not have any PML.
 
@@ -36,6 +115,9 @@ def backward_wave_propagator_no_pml(Wave_obj, dt=None):
     dt: Python 'float' (optional)
         Time step to be used explicitly. If not mentioned uses the default,
         that was estabilished in the wave object for the adjoint model.
+    accumulate_gradient: bool (optional)
+        If True (default), accumulates the gradient samples and solves the
+        mass problem once. Otherwise solves it for every sample.
 
     Returns:
     --------
@@ -58,9 +140,6 @@ def backward_wave_propagator_no_pml(Wave_obj, dt=None):
     output = fire.File(output_filename, comm=comm.comm)
     comm.comm.barrier()
 
-    X = fire.Function(Wave_obj.function_space)
-    dJ = fire.Function(Wave_obj.function_space)  # , name="gradient")
-
     final_time = Wave_obj.final_time
     dt = Wave_obj.dt
     t = Wave_obj.current_time
@@ -68,56 +147,41 @@ def backward_wave_propagator_no_pml(Wave_obj, dt=None):
         print(f"Current time of {t}, different than final_time of {final_time}. Setting final_time to current time in backwards propagation.", flush= True)
     nt = int(t / dt) + 1  # number of timesteps
 
-    u_nm1 = Wave_obj.u_nm1
-    u_n = Wave_obj.u_n
-    u_np1 = fire.Function(Wave_obj.function_space)
-
     rhs_forcing = fire.Cofunction(Wave_obj.function_space.dual())
 
     B = Wave_obj.B
-    rhs = Wave_obj.rhs
 
     # Define a gradient problem
-    m_u = fire.TrialFunction(Wave_obj.function_space)
     m_v = fire.TestFunction(Wave_obj.function_space)
-    mgrad = m_u * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
 
     dufordt2 = fire.Function(Wave_obj.function_space)
     uadj = fire.Function(Wave_obj.function_space)  # auxiliarly function for the gradient compt.
 
     ffG = -2 * (Wave_obj.c)**(-3) * fire.dot(dufordt2, uadj) * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
 
-    lhsG = mgrad
-    rhsG = ffG
-
-    gradi = fire.Function(Wave_obj.function_space)
-    grad_prob = fire.LinearVariationalProblem(lhsG, rhsG, gradi)
-    grad_solver = fire.LinearVariationalSolver(
-        grad_prob,
-        solver_parameters={
-            "ksp_type": "preonly",
-            "pc_type": "jacobi",
-            "mat_type": "matfree",
-        },
+    gradient = GradientAccumulator(
+        Wave_obj, ffG, accumulate=accumulate_gradient
     )
 
     # assembly_callable = create_assembly_callable(rhs, tensor=B)
 
     for step in range(nt-1, -1, -1):
         rhs_forcing.assign(0.0)
-        B = fire.assemble(rhs, tensor=B)
+        B = fire.assemble(Wave_obj.rhs, tensor=B)
         f = receivers.apply_receivers_as_source(rhs_forcing, residual, step)
         B0 = B.sub(0)
         B0 += f
-        Wave_obj.solver.solve(X, B)
-
-        u_np1.assign(X)
+        u_n = Wave_obj.vstate
+        u_np1 = Wave_obj.next_vstate
+        Wave_obj.solver.solve(u_np1, B)
 
         if (step) % Wave_obj.output_frequency == 0:
-            assert (
-                fire.norm(u_n) < 1
-            ), "Numerical instability. Try reducing dt or building the \
-                mesh differently"
+            helpers.check_stability(
+                u_n,
+                comm,
+                check=Wave_obj.stability_check,
+                threshold=Wave_obj.stability_threshold,
+            )
             if Wave_obj.forward_output:
                 output.write(u_n, time=t, name="Pressure")
 
@@ -135,25 +199,24 @@ def backward_wave_propagator_no_pml(Wave_obj, dt=None):
                     (forward_solution.pop() - 2.0 * 0.0 + 0.0) / fire.Constant(dt**2)
                 )
 
-            grad_solver.solve()
             if step == nt-1 or step == 0:
-                dJ += gradi
+                gradient.add_sample(1.0)
             else:
-                dJ += 2*gradi
+                gradient.add_sample(2.0)
 
-        u_nm1.assign(u_n)
-        u_n.assign(u_np1)
+        Wave_obj.rotate_states()
 
         t = step * float(dt)
 
     Wave_obj.current_time = t
     helpers.display_progress(Wave_obj.comm, t)
 
+    dJ = gradient.get_gradient()
     dJ.dat.data_with_halos[:] *= (dt/2)
     return dJ
 
 
-def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
+def mixed_space_backward_wave_propagator(Wave_obj, dt=None, accumulate_gradient=True):
     """Propagates the adjoint wave backwards in time.
     Currently uses central differences. Based on the
     mixed space implementation of PML.
@@ -165,6 +228,9 @@ def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
     dt: Python 'float' (optional)
         Time step to be used explicitly. If not mentioned uses the default,
         that was estabilished in the wave object for the adjoint model.
+    accumulate_gradient: bool (optional)
+        If True (default), accumulates the gradient samples and solves the
+        mass problem once. Otherwise solves it for every sample.
 
     Returns:
     --------
@@ -187,9 +253,6 @@ def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
     output = fire.File(output_filename, comm=comm.comm)
     comm.comm.barrier()
 
-    X = Wave_obj.X
-    dJ = fire.Function(Wave_obj.function_space)  # , name="gradient")
-
     final_time = Wave_obj.final_time
     dt = Wave_obj.dt
     t = Wave_obj.current_time
@@ -197,19 +260,12 @@ def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
         print(f"Current time of {t}, different than final_time of {final_time}. Setting final_time to current time in backwards propagation.", flush= True)
     nt = int(t / dt) + 1  # number of timesteps
 
-    X_nm1 = Wave_obj.X_nm1
-    X_n = Wave_obj.X_n
-    X_np1 = fire.Function(Wave_obj.mixed_function_space)
-
     rhs_forcing = fire.Cofunction(Wave_obj.function_space.dual())
 
     B = Wave_obj.B
-    rhs = Wave_obj.rhs
 
     # Define a gradient problem
-    m_u = fire.TrialFunction(Wave_obj.function_space)
     m_v = fire.TestFunction(Wave_obj.function_space)
-    mgrad = m_u * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
 
     # dufordt2 = fire.Function(Wave_obj.function_space)
     ufor = fire.Function(Wave_obj.function_space)
@@ -218,33 +274,29 @@ def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
     # ffG = -2 * (Wave_obj.c)**(-3) * fire.dot(dufordt2, uadj) * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
     ffG =  2.0 * Wave_obj.c * fire.dot(fire.grad(uadj), fire.grad(ufor)) * m_v * fire.dx(scheme=Wave_obj.quadrature_rule)
 
-    lhsG = mgrad
-    rhsG = ffG
-
-    gradi = fire.Function(Wave_obj.function_space)
-    grad_prob = fire.LinearVariationalProblem(lhsG, rhsG, gradi)
-    grad_solver = fire.LinearVariationalSolver(
-        grad_prob,
-        solver_parameters={
-            "ksp_type": "preonly",
-            "pc_type": "jacobi",
-            "mat_type": "matfree",
-        },
+    gradient = GradientAccumulator(
+        Wave_obj, ffG, accumulate=accumulate_gradient
     )
 
     # assembly_callable = create_assembly_callable(rhs, tensor=B)
 
     for step in range(nt-1, -1, -1):
         rhs_forcing.assign(0.0)
-        B = fire.assemble(rhs, tensor=B)
+        B = fire.assemble(Wave_obj.rhs, tensor=B)
         f = receivers.apply_receivers_as_source(rhs_forcing, residual, step)
         B0 = B.sub(0)
         B0 += f
-        Wave_obj.solver.solve(X, B)
-
-        X_np1.assign(X)
+        X_n = Wave_obj.vstate
+        X_np1 = Wave_obj.next_vstate
+        Wave_obj.solver.solve(X_np1, B)
 
         if (step) % Wave_obj.output_frequency == 0:
+            helpers.check_stability(
+                X_n.sub(0),
+                comm,
+                check=Wave_obj.stability_check,
+                threshold=Wave_obj.stability_threshold,
+            )
             if Wave_obj.forward_output:
                 output.write(X_n.sub(0), time=t, name="Pressure")
 
@@ -255,19 +307,18 @@ def mixed_space_backward_wave_propagator(Wave_obj, dt=None):
             uadj.assign(X_np1.sub(0))
             ufor.assign(forward_solution.pop())
 
-            grad_solver.solve()
             if step == nt-1 or step == 0:
-                dJ += gradi
+                gradient.add_sample(1.0)
             else:
-                dJ += 2*gradi
+                gradient.add_sample(2.0)
 
-        X_nm1.assign(X_n)
-        X_n.assign(X_np1)
+        Wave_obj.rotate_states()
 
         t = step * float(dt)
 
     Wave_obj.current_time = t
     helpers.display_progress(Wave_obj.comm, t)
 
+    dJ = gradient.get_gradient()
     dJ.dat.data_with_halos[:] *= (dt/2)
     return dJ
@@ -0,0 +1,215 @@
+from math import comb
+
+import firedrake as fire
+
+
+def repetition_number(number_of_steps, snapshots):
+    """Smallest number of repetitions ``t`` such that a binomial
+    (revolve) schedule with ``snapshots`` free checkpoints can reverse
+    ``number_of_steps`` steps, i.e. ``comb(snapshots + t, snapshots) >=
+    number_of_steps``.
+
+    Parameters
+    ----------
+    number_of_steps: int
+        Number of steps to be reversed.
+    snapshots: int
+        Number of free checkpoints (not counting the initial state).
+
+    Returns
+    -------
+    t: int
+        Repetition number.
+    """
+    t = 0
+    while comb(snapshots + t, snapshots) < number_of_steps:
+        t += 1
+    return t
+
+
+def binomial_split(number_of_steps, snapshots):
+    """Offset, from the beginning of a segment, where the next checkpoint
+    is placed by the binomial (revolve) schedule.
+
+    The first subsegment is reversed later with the same number of
+    checkpoints and one repetition less, while the second one is reversed
+    first with one checkpoint less and the same number of repetitions.
+
+    Parameters
+    ----------
+    number_of_steps: int
+        Length of the segment to be reversed (at least 2).
+    snapshots: int
+        Number of free checkpoints (at least 1).
+
+    Returns
+    -------
+    offset: int
+        Number of steps between the segment start and the new checkpoint.
+    """
+    t = repetition_number(number_of_steps, snapshots)
+    offset = comb(snapshots + t - 1, snapshots)
+    return max(1, min(offset, number_of_steps - 1))
+
+
+def first_sweep_checkpoints(number_of_samples, snapshots):
+    """Sample indices where the forward sweep should store checkpoints, so
+    that the first descent of the binomial schedule needs no recomputation.
+
+    Parameters
+    ----------
+    number_of_samples: int
+        Number of gradient samples in the forward propagation.
+    snapshots: int
+        Number of free checkpoints.
+
+    Returns
+    -------
+    checkpoints: list of int
+        Sample indices, always starting with 0.
+    """
+    checkpoints = [0]
+    lo = 0
+    free = snapshots
+    while number_of_samples - lo > 1 and free > 0:
+        lo += binomial_split(number_of_samples - lo, free)
+        checkpoints.append(lo)
+        free -= 1
+    return checkpoints
+
+
+class CheckpointedForwardSolution:
+    """Forward solution that keeps only a fixed number of wave states in
+    memory and recomputes the sampled snapshots needed by the adjoint
+    propagation following a binomial (revolve) schedule.
+
+    It behaves as the list of sampled snapshots that ``central_difference``
+    stores when no checkpointing is used: snapshots are consumed from the
+    end with ``pop()`` and the previous ones are accessed with negative
+    indices.
+
+    Attributes
+    ----------
+    wave: spyro.Wave
+        Wave object that propagated the forward wave.
+    snapshots: int
+        Number of free checkpoints besides the initial state.
+    number_of_samples: int
+        Number of sampled snapshots in the forward propagation.
+    checkpoints: dict
+        Stored ``(prev_vstate, vstate)`` copies indexed by sample.
+    """
+
+    def __init__(self, wave, number_of_samples, snapshots, rhs_forcing=None):
+        self.wave = wave
+        self.snapshots = snapshots
+        self.number_of_samples = number_of_samples
+        self.rhs_forcing = rhs_forcing
+        self.checkpoints = {}
+        self.first_sweep = set(
+            first_sweep_checkpoints(number_of_samples, snapshots)
+        )
+        self.number_of_recomputed_steps = 0
+
+        self._length = number_of_samples
+        self._cache = {}
+        self._reversal = None
+
+    def store(self, sample):
+        """Stores the current wave state if ``sample`` is one of the
+        checkpoints of the forward sweep."""
+        if sample in self.first_sweep:
+            self._take(sample)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("Forward snapshot index out of range")
+        return self._get(index)
+
+    def pop(self):
+        snapshot = self[-1]
+        self._length -= 1
+        for sample in [k for k in self._cache if k >= self._length]:
+            del self._cache[sample]
+        return snapshot
+
+    def _get(self, sample):
+        if sample in self._cache:
+            return self._cache[sample]
+
+        if self._reversal is None:
+            self._reversal = self._reverse(0, self.number_of_samples,
+                                           self.snapshots)
+
+        # The recomputation uses the same state variables as the adjoint
+        wave = self.wave
+        adjoint_state = (
+            wave.prev_vstate.copy(deepcopy=True),
+            wave.vstate.copy(deepcopy=True),
+            wave.next_vstate.copy(deepcopy=True),
+        )
+        ring = wave.state_ring
+        adjoint_offset = None if ring is None else ring.offset
+        while sample not in self._cache:
+            k = next(self._reversal)
+            if k <= sample:
+                snapshot = fire.Function(wave.function_space,
+                                         name=wave.get_function_name())
+                self._cache[k] = snapshot.assign(wave.get_function())
+        # Rotating back the ring restores the adjoint references to states
+        while ring is not None and ring.offset != adjoint_offset:
+            wave.rotate_states()
+        wave.prev_vstate, wave.vstate, wave.next_vstate = adjoint_state
+
+        return self._cache[sample]
+
+    def _take(self, sample):
+        self.checkpoints[sample] = (
+            self.wave.prev_vstate.copy(deepcopy=True),
+            self.wave.vstate.copy(deepcopy=True),
+        )
+
+    def _restore(self, sample):
+        prev_vstate, vstate = self.checkpoints[sample]
+        self.wave.prev_vstate = prev_vstate
+        self.wave.vstate = vstate
+
+    def _advance(self, start, end):
+        # Imported here to avoid a circular import
+        from .time_integration_central_difference import (
+            central_difference_step,
+        )
+
+        gsf = self.wave.gradient_sampling_frequency
+        for step in range(start * gsf + 1, end * gsf + 1):
+            central_difference_step(self.wave, step, self.rhs_forcing)
+        self.number_of_recomputed_steps += (end - start) * gsf
+
+    def _reverse(self, lo, hi, free):
+        """Yields the samples in [lo, hi) in reverse order, leaving the
+        wave state at the yielded sample. Assumes a checkpoint at lo."""
+        if hi - lo == 1:
+            self._restore(lo)
+            yield lo
+            return
+
+        if free == 0:
+            for sample in range(hi - 1, lo - 1, -1):
+                self._restore(lo)
+                self._advance(lo, sample)
+                yield sample
+            return
+
+        mid = lo + binomial_split(hi - lo, free)
+        if mid not in self.checkpoints:
+            self._restore(lo)
+            self._advance(lo, mid)
+            self._take(mid)
+        yield from self._reverse(mid, hi, free - 1)
+        del self.checkpoints[mid]
+        yield from self._reverse(lo, mid, free)
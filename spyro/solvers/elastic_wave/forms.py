@@ -4,6 +4,7 @@ from firedrake import (assemble, Cofunction, Constant, div, dot, dx, grad,
                        inner, lhs, LinearSolver, rhs, TestFunction, TrialFunction)
 
 from .local_abc import clayton_engquist_A1
+from ..state_ring import StateRing
 
 def isotropic_elastic_without_pml(wave):
     V = wave.function_space
@@ -49,6 +50,7 @@ def isotropic_elastic_without_pml(wave):
 
     wave.rhs = rhs(F)
     wave.B = Cofunction(V.dual())
+    wave.state_ring = StateRing(wave.rhs, u_nm1, u_n, wave.u_np1)
 
 def isotropic_elastic_with_pml():
     raise NotImplementedError
\ No newline at end of file
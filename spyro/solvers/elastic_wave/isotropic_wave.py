@@ -107,6 +107,12 @@ class IsotropicWave(ElasticWave):
     def _get_next_vstate(self):
         return self.u_np1
     
+    @override
+    def _set_state_references(self, prev_vstate, vstate, next_vstate):
+        self.u_nm1 = prev_vstate
+        self.u_n = vstate
+        self.u_np1 = next_vstate
+
     @override
     def get_receivers_output(self):
         if self.abc_boundary_layer_type == "PML":
@@ -126,6 +132,7 @@ class IsotropicWave(ElasticWave):
     @override
     def matrix_building(self):
         self.current_time = 0.0
+        self.state_ring = None
 
         self.u_n = Function(self.function_space,
                             name=self.get_function_name())
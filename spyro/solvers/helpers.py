@@ -1,7 +1,8 @@
 import os
 
 import numpy as np
-from firedrake import File
+from firedrake import File, norm
+from mpi4py import MPI
 
 from .. import io
 
@@ -11,6 +12,7 @@ __all__ = [
     "display_progress",
     "receivers_local",
     "fill",
+    "check_stability",
 ]
 
 
@@ -20,8 +22,8 @@ def fill(usol_recv, is_local, nt, nr):
 
     Parameters
     ----------
-    usol_recv : list
-        List of numpy arrays
+    usol_recv : numpy array
+        Receiver traces with shape (nt, nr, ...). Modified in place
     is_local : list
         List of booleans indicating if the receiver is local to the core
     nt : int
@@ -31,18 +33,57 @@ def fill(usol_recv, is_local, nt, nr):
 
     Returns
     -------
-    usol_recv : list
-        List of numpy arrays
+    usol_recv : numpy array
+        Receiver traces with shape (nt, nr, ...)
 
     """
     usol_recv = np.asarray(usol_recv)
-    for ti in range(nt):
-        for rn in range(nr):
-            if is_local[rn] is None:
-                usol_recv[ti][rn] = -99999.0
+    not_local = np.array([is_local[rn] is None for rn in range(nr)], dtype=bool)
+    usol_recv[:nt, not_local] = -99999.0
     return usol_recv
 
 
+def check_stability(function, comm, check="norm", threshold=1.0):
+    """Checks that the wave solution did not blow up
+
+    Parameters
+    ----------
+    function : firedrake.Function
+        Solution to check (e.g. pressure or displacement)
+    comm : object
+        MPI communicator
+    check : str or None
+        "norm" (default) compares the L2 norm of the function, "max"
+        compares the maximum absolute nodal value, with a single
+        reduction over the spatial communicator, and None disables the
+        check
+    threshold : float
+        Value above which the solution is considered unstable
+
+    Raises
+    ------
+    AssertionError
+        If the solution is not finite or above the threshold
+    """
+    if check is None:
+        return
+    elif check == "max":
+        local_max = np.max(np.abs(function.dat.data_ro), initial=0.0)
+        # NaN propagates through np.max but not through the MPI reduction
+        if not np.isfinite(local_max):
+            local_max = np.inf
+        value = comm.comm.allreduce(local_max, op=MPI.MAX)
+    elif check == "norm":
+        value = norm(function)
+    else:
+        raise ValueError(f"Stability check {check} not supported.")
+
+    assert (
+        value < threshold
+    ), "Numerical instability. Try reducing dt or building the " \
+       "mesh differently"
+
+
 def create_output_file(name, comm, source_num):
     """Saves shots in output file
 
@@ -1,13 +1,22 @@
 import firedrake as fire
+from firedrake.petsc import PETSc
+import hashlib
 import warnings
+from collections import OrderedDict
 from scipy.optimize import minimize as scipy_minimize
 from mpi4py import MPI
 import numpy as np
 
 from .acoustic_wave import AcousticWave
-from ..utils import compute_functional
-from ..utils import Gradient_mask_for_pml, Mask
+from ..utils.utils import butter_lowpass_filter, resample_shot_record
+from ..utils import Gradient_mask_for_pml, Mask, reduce_gradient, MisfitFunction
+from ..utils import SourceEncoding
 from ..plots import plot_model as spyro_plot_model
+from ..io.shot_scheduler import (
+    ShotScheduler,
+    has_multiple_shots_per_member,
+    needs_all_shot_records,
+)
 
 try:
     from ROL.firedrake_vector import FiredrakeVector as FireVector
@@ -106,9 +115,27 @@ class FullWaveformInversion(AcousticWave):
     inner_product: (str)
         The inner product. Default is 'L2'.
     misfit:
-        The misfit between the current forward shot record and the real observed data.
+        The adjoint source of the misfit between the current forward shot record and the real observed data
+        (their difference for the default L2 misfit), or a dictionary of them by shot.
+    misfit_function: (MisfitFunction)
+        Objective function. Set by the "misfit_type" ("l2", "cross_correlation", "envelope" or
+        "trace_normalized"), "misfit_time_window" and "misfit_receiver_weights" inversion options.
+    local_functional: (float)
+        Functional of the shots of this ensemble member, before the reduction across the ensemble.
+    source_encoder: (SourceEncoding)
+        Random codes of the encoded supershot of this ensemble member, if the "source_encoding" inversion
+        option is set. Each member fires all sources at once, so an evaluation costs one forward and one
+        adjoint propagation per member instead of one per source.
+    iterations_per_encoding: (int)
+        Number of L-BFGS-B iterations of run_fwi between new draws of the source encoding. Default is 1.
     guess_forward_solution:
         The guess forward solution.
+    evaluation_cache: (OrderedDict)
+        Least recently used cache of (functional, gradient) pairs indexed
+        by a hash of the control vector.
+    evaluation_cache_size: (int)
+        Maximum number of cached evaluations. Default is 4, 0 disables the
+        cache.
 
     Methods:
     --------
@@ -132,6 +159,16 @@ class FullWaveformInversion(AcousticWave):
         Gets the functional.
     get_gradient(save=False):
         Gets the gradient.
+    run_fwi(**kwargs):
+        Runs the FWI with scipy's L-BFGS-B.
+    run_fwi_tao(**kwargs):
+        Runs the FWI with PETSc TAO keeping the model distributed.
+    run_fwi_with_degree_continuation(stages, **kwargs):
+        Runs the FWI in stages of increasing polynomial degree on the same mesh.
+    set_degree(degree):
+        Rebuilds the function space with a new polynomial degree.
+    draw_source_encoding():
+        Draws new random codes for the encoded supershots.
     """
 
     def __init__(self, dictionary=None, comm=None):
@@ -163,7 +200,38 @@ class FullWaveformInversion(AcousticWave):
         self.misfit = None
         self.guess_forward_solution = None
         self.has_gradient_mask = False
+        self.gradient_mask_boundaries = None
+        self.misfit_cutoff_frequency = None
         self.functional_history = []
+        self.evaluation_cache = OrderedDict()
+        self.evaluation_cache_size = self.input_dictionary["inversion"].get(
+            "evaluation_cache_size", 4
+        )
+        self.forward_key = None
+        self.misfit_function = MisfitFunction(
+            misfit_type=self.input_dictionary["inversion"].get("misfit_type", "l2"),
+            time_window=self.input_dictionary["inversion"].get("misfit_time_window"),
+            receiver_weights=self.input_dictionary["inversion"].get("misfit_receiver_weights"),
+        )
+        self.local_functional = None
+        self.source_encoder = None
+        if self.source_encoding is not None:
+            seed = self.input_dictionary["inversion"].get("source_encoding_seed")
+            if seed is None:
+                seed = self.comm.global_comm.bcast(
+                    np.random.SeedSequence().entropy, root=0
+                )
+            # Every ensemble member fires its own random supershot
+            self.source_encoder = SourceEncoding(
+                self.source_encoding,
+                self.number_of_sources,
+                seed=[seed, self.comm.ensemble_comm.rank],
+            )
+        self.iterations_per_encoding = self.input_dictionary["inversion"].get(
+            "iterations_per_encoding", 1
+        )
+        self._encoded_shot_record = None
+        self._encoded_shot_record_key = None
         self.control_out = fire.File("results/control.pvd")
         self.gradient_out = fire.File("results/gradient.pvd")
 
@@ -178,15 +246,76 @@ class FullWaveformInversion(AcousticWave):
             self.initial_velocity_model = self.guess_velocity_model
         if c is not None:
             self.initial_velocity_model.dat.data[:] = c
+        if self.source_encoder is not None:
+            self._set_encoded_sources()
         self.forward_solve()
         output = fire.File("control_" + str(self.current_iteration)+".pvd")
         output.write(self.c)
-        self.guess_shot_record = self.forward_solution_receivers
         self.guess_forward_solution = self.forward_solution
-
-        self.misfit = self.real_shot_record - self.guess_shot_record
+        if has_multiple_shots_per_member(self):
+            self.guess_shot_record = {
+                snum: self._filter_guess_record(record)
+                for snum, record in self.shot_records.items()
+            }
+            self.misfit = {}
+            self.local_functional = 0.0
+            for snum, record in self.guess_shot_record.items():
+                J, self.misfit[snum] = self.misfit_function.evaluate(
+                    record, self.real_shot_record[snum], self.dt
+                )
+                self.local_functional += J
+            return self.misfit
+
+        self.guess_shot_record = self._filter_guess_record(
+            self.forward_solution_receivers
+        )
+        self.local_functional, self.misfit = self.misfit_function.evaluate(
+            self.guess_shot_record, self._get_observed_shot_record(), self.dt
+        )
         return self.misfit
 
+    def draw_source_encoding(self):
+        """
+        Draws new random codes for the encoded supershots. run_fwi calls it every iterations_per_encoding
+        iterations. With other optimizers the codes drawn on the first evaluation are kept unless this is
+        called again.
+        """
+        self.source_encoder.draw()
+        # Evaluations of other supershots are not comparable
+        self.evaluation_cache.clear()
+        self.forward_key = None
+
+    def _set_encoded_sources(self):
+        """Fires all sources at once with the current codes. The signals are
+        rebuilt for every propagation, since the wavelet changes with dt."""
+        if self.source_encoder.codes is None:
+            self.draw_source_encoding()
+        if self.function_space is None:
+            self.force_rebuild_function_space()
+        self.sources.set_simultaneous_sources(
+            wavelets=self.source_encoder.encode_wavelets(self.sources.wavelet)
+        )
+
+    def _get_observed_shot_record(self):
+        """Observed record of this ensemble member, encoded as its supershot
+        if source encoding is on."""
+        if self.source_encoder is None:
+            return self.real_shot_record
+        key = (self.source_encoder.realization, id(self.real_shot_record))
+        if key != self._encoded_shot_record_key:
+            self._encoded_shot_record = self.source_encoder.encode_records(
+                self.real_shot_record
+            )
+            self._encoded_shot_record_key = key
+        return self._encoded_shot_record
+
+    def _filter_guess_record(self, record):
+        if self.misfit_cutoff_frequency is None:
+            return record
+        return butter_lowpass_filter(
+            record, self.misfit_cutoff_frequency, 1.0 / self.dt
+        )
+
     def generate_real_shot_record(self, plot_model=False, filename=None, abc_points=None):
         """
         Generates the real synthetic shot record. Only for use in synthetic test cases.
@@ -358,13 +487,42 @@ class FullWaveformInversion(AcousticWave):
             float: The functional value.
         """
         self.calculate_misfit(c=c)
-        Jm = compute_functional(self, self.misfit)
+        Jm = self.comm.ensemble_comm.allreduce(self.local_functional, op=MPI.SUM)
 
         self.functional_history.append(Jm)
         self.functional = Jm
+        self.forward_key = self._get_forward_key()
 
         return Jm
 
+    def _get_forward_key(self, c=None):
+        """Hash of the velocity model values (or of ``c``) and of what else
+        the forward solution depends on."""
+        if c is None:
+            c = self.initial_velocity_model.dat.data_ro
+        digest = hashlib.sha1(
+            np.ascontiguousarray(c, dtype=np.float64).tobytes()
+        ).hexdigest()
+        encoding = None
+        if self.source_encoder is not None:
+            encoding = self.source_encoder.realization
+        return (
+            digest, self.degree, float(self.dt), id(self.real_shot_record), encoding
+        )
+
+    def _has_forward_solution(self, c=None):
+        """Whether the stored forward solution, not yet consumed by an
+        adjoint propagation, corresponds to the velocity model ``c``. The
+        decision is made collectively, since every rank has to take part
+        in the same propagations."""
+        if self.initial_velocity_model is None:
+            return False
+        has_forward = (
+            self.forward_key is not None
+            and self.forward_key == self._get_forward_key(c=c)
+        )
+        return MPI.COMM_WORLD.allreduce(has_forward, op=MPI.LAND)
+
     def get_gradient(self, c=None, save=True, calculate_functional=True):
         """
         Calculates the gradient of the functional with respect to the model parameters.
@@ -379,34 +537,55 @@ class FullWaveformInversion(AcousticWave):
         Firedrake function
         """
         comm = self.comm
-        if calculate_functional:
-            self.get_functional(c=c)
-        comm.comm.barrier()
+        local_functional = None
+        if calculate_functional and not self._has_forward_solution(c=c):
+            # The functional is reduced together with the gradient
+            self.calculate_misfit(c=c)
+            local_functional = self.local_functional
+        # Sum of the gradients of the shots of this ensemble member
         dJ = self.gradient_solve(misfit=self.misfit, forward_solution=self.guess_forward_solution)
-        dJ_total = fire.Function(self.function_space)
-        comm.comm.barrier()
-        dJ_total = comm.allreduce(dJ, dJ_total)
-        dJ_total /= comm.ensemble_comm.size
-        if comm.comm.size > 1:
-            dJ_total /= comm.comm.size
+        # The adjoint propagation consumes the forward solution
+        self.forward_key = None
+        dJ_total, Jm = reduce_gradient(comm, dJ, functional=local_functional)
+        if Jm is not None:
+            self.functional_history.append(Jm)
+            self.functional = Jm
         self.gradient = dJ_total
         self._apply_gradient_mask()
         if save and comm.comm.rank == 0:
             # self.gradient_out.write(dJ_total)
             output = fire.File("gradient_" + str(self.current_iteration)+".pvd")
             output.write(dJ_total)
-            print("DEBUG")
         self.current_iteration += 1
-        comm.comm.barrier()
 
     def return_functional_and_gradient(self, c):
+        """
+        Returns the functional and its gradient for the control vector
+        ``c``. Evaluations are cached, so a model revisited by the line
+        search does not need new forward and adjoint propagations.
+        """
+        key = self._get_forward_key(c=c)
+        if key in self.evaluation_cache:
+            self.evaluation_cache.move_to_end(key)
+            Jm, dJ = self.evaluation_cache[key]
+            self.functional = Jm
+            return Jm, dJ.copy()
+
         self.get_gradient(c=c)
         dJ = self.gradient.dat.data[:]
+
+        if self.evaluation_cache_size > 0:
+            self.evaluation_cache[key] = (self.functional, dJ.copy())
+            while len(self.evaluation_cache) > self.evaluation_cache_size:
+                self.evaluation_cache.popitem(last=False)
         return self.functional, dJ
 
     def run_fwi(self, **kwargs):
         """
         Run the full waveform inversion.
+
+        With source encoding, new supershots are drawn every iterations_per_encoding iterations and
+        L-BFGS-B is restarted from the current model.
         """
         parameters = {
             "vmin": 1.429,
@@ -421,6 +600,7 @@ class FullWaveformInversion(AcousticWave):
 
         vmin = parameters["vmin"]
         vmax = parameters["vmax"]
+        self.evaluation_cache.clear()
         vp_0 = self.initial_velocity_model.vector().gather()
         bounds = [(vmin, vmax) for _ in range(len(vp_0))]
         options = parameters["scipy_options"]
@@ -434,18 +614,194 @@ class FullWaveformInversion(AcousticWave):
         # else:
         #     warnings.warn("Iteration limit reached. FWI stopped.")
         #     self.running_fwi = False
-        result = scipy_minimize(
-            self.return_functional_and_gradient,
-            vp_0,
-            method="L-BFGS-B",
-            jac=True,
-            tol=1e-15,
-            bounds=bounds,
-            options=options,
-        )
+        def minimize(x0, scipy_options):
+            return scipy_minimize(
+                self.return_functional_and_gradient,
+                x0,
+                method="L-BFGS-B",
+                jac=True,
+                tol=1e-15,
+                bounds=bounds,
+                options=scipy_options,
+            )
+
+        if self.source_encoder is None:
+            result = minimize(vp_0, options)
+        else:
+            # New supershots are drawn between short L-BFGS-B runs, so that
+            # each line search compares functionals of the same supershots
+            result = None
+            x = vp_0
+            remaining = options["maxiter"]
+            while result is None or remaining > 0:
+                self.draw_source_encoding()
+                iterations = min(self.iterations_per_encoding, remaining)
+                result = minimize(x, dict(options, maxiter=iterations))
+                x = result.x
+                remaining -= iterations
         vp_end = fire.Function(self.function_space)
         vp_end.dat.data[:] = result.x
         fire.File("vp_end.pvd").write(vp_end)
+        return result
+
+    def run_fwi_tao(self, **kwargs):
+        """
+        Run the full waveform inversion with a bound-constrained PETSc TAO
+        solver (limited memory variable metric by default). The control is
+        the PETSc Vec of the velocity model, distributed over the spatial
+        communicator, so the model is never gathered and the optimizer
+        does not run redundantly on every core.
+
+        Parameters:
+        -----------
+        vmin: float
+            Lower bound of the velocity. Default is 1.429.
+        vmax: float
+            Upper bound of the velocity. Default is 6.0.
+        maxiter: int
+            Maximum number of iterations. Default is 20.
+        tao_type: str
+            TAO solver type. Default is "blmvm".
+        gatol: float
+            Absolute gradient norm tolerance. Default is 1e-15.
+
+        Returns:
+        --------
+        tao: petsc4py.PETSc.TAO
+            The TAO solver after the optimization.
+        """
+        parameters = {
+            "vmin": 1.429,
+            "vmax": 6.0,
+            "maxiter": 20,
+            "tao_type": "blmvm",
+            "gatol": 1e-15,
+        }
+        parameters.update(kwargs)
+
+        vp = self.initial_velocity_model
+
+        def objective_and_gradient(tao, x, g):
+            with vp.dat.vec_wo as vp_vec:
+                x.copy(vp_vec)
+            self.get_gradient()
+            with self.gradient.dat.vec_ro as gradient_vec:
+                gradient_vec.copy(g)
+            return self.functional
+
+        with vp.dat.vec_ro as vp_vec:
+            x = vp_vec.copy()
+        gradient = x.duplicate()
+        lower_bound = x.duplicate()
+        lower_bound.set(parameters["vmin"])
+        upper_bound = x.duplicate()
+        upper_bound.set(parameters["vmax"])
+
+        tao = PETSc.TAO().create(comm=self.comm.comm)
+        tao.setType(parameters["tao_type"])
+        tao.setObjectiveGradient(objective_and_gradient, gradient)
+        tao.setVariableBounds(lower_bound, upper_bound)
+        tao.setMaximumIterations(parameters["maxiter"])
+        tao.setTolerances(gatol=parameters["gatol"], grtol=0.0, gttol=0.0)
+        tao.setFromOptions()
+        tao.solve(x)
+
+        with vp.dat.vec_wo as vp_vec:
+            x.copy(vp_vec)
+        fire.File("vp_end.pvd").write(vp)
+        return tao
+
+    def set_degree(self, degree):
+        """
+        Rebuilds the function space, sources and receivers with a new
+        polynomial degree on the same mesh, and interpolates the current
+        velocity model (and gradient mask) into it.
+
+        Parameters:
+        -----------
+        degree: int
+            New polynomial degree.
+        """
+        if degree < 1:
+            raise ValueError("Degree must be greater than 0.")
+        old_velocity_model = self.initial_velocity_model
+        self.degree = degree
+        self._build_function_space()
+        self._map_sources_and_receivers()
+
+        if old_velocity_model is not None:
+            vp = fire.Function(self.function_space, name="velocity")
+            vp.interpolate(old_velocity_model)
+            self.initial_velocity_model = vp
+            self.guess_velocity_model = vp
+            # The timestep of the new space is estimated with this model
+            self.c = vp
+        if self.has_gradient_mask:
+            self.set_gradient_mask(boundaries=self.gradient_mask_boundaries)
+
+    def run_fwi_with_degree_continuation(self, stages, **kwargs):
+        """
+        Run the full waveform inversion with polynomial degree continuation
+        on a fixed mesh. Low frequency stages use low degree spaces and
+        larger timesteps, and the degree is raised with the frequency
+        content. The velocity model is interpolated between the spaces of
+        consecutive stages. Only the model is carried over: each stage
+        starts L-BFGS-B with an empty memory, since the curvature pairs of
+        one space do not apply to the controls of the next one.
+
+        Parameters:
+        -----------
+        stages: list of dict
+            One dictionary per stage, with the keys "degree" (required),
+            "cutoff_frequency" (low-pass cutoff in Hz for both the observed
+            and the modelled shot records, None for no filter), "dt" (if
+            not given, uses a fraction "dt_fraction" of the estimated
+            maximum stable timestep, 0.7 by default) and "maxiter".
+        **kwargs:
+            Options passed to ``run_fwi`` in every stage (e.g. vmin, vmax).
+
+        Returns:
+        --------
+        results: list
+            Optimization results of each stage.
+        """
+        real_shot_record = self.real_shot_record
+        real_dt = self.dt
+        if self.initial_velocity_model is None:
+            self.initial_velocity_model = self.guess_velocity_model
+
+        results = []
+        for stage in stages:
+            self.set_degree(stage["degree"])
+            if stage.get("dt") is not None:
+                self.dt = stage["dt"]
+            else:
+                self.get_and_set_maximum_dt(
+                    fraction=stage.get("dt_fraction", 0.7)
+                )
+
+            cutoff_frequency = stage.get("cutoff_frequency")
+            observed = real_shot_record
+            if cutoff_frequency is not None:
+                observed = butter_lowpass_filter(
+                    observed, cutoff_frequency, 1.0 / real_dt
+                )
+            self.real_shot_record = resample_shot_record(
+                observed, real_dt, self.dt, self.final_time
+            )
+            self.misfit_cutoff_frequency = cutoff_frequency
+
+            stage_options = dict(kwargs)
+            if "maxiter" in stage:
+                stage_options["maxiter"] = stage["maxiter"]
+            result = self.run_fwi(**stage_options)
+            self.initial_velocity_model.dat.data[:] = result.x
+            results.append(result)
+
+        self.real_shot_record = real_shot_record
+        self.misfit_cutoff_frequency = None
+
+        return results
 
     def run_fwi_rol(self, **kwargs):
         """
@@ -521,6 +877,7 @@ class FullWaveformInversion(AcousticWave):
 
         """
         self.has_gradient_mask = True
+        self.gradient_mask_boundaries = boundaries
 
         if self.abc_active is False and boundaries is None:
             raise ValueError("If no abc boundary please define boundaries for the mask")
@@ -579,4 +936,9 @@ class SyntheticRealAcousticWave(AcousticWave):
 
     def forward_solve(self):
         super().forward_solve()
-        self.real_shot_record = self.receivers_output
+        if needs_all_shot_records(self):
+            # Any member may run or encode any shot of the guess model
+            scheduler = ShotScheduler(self.comm, self.number_of_sources)
+            self.real_shot_record = scheduler.gather_records(self.shot_records)
+        else:
+            self.real_shot_record = self.receivers_output
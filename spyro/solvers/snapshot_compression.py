@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class Float32Codec:
+    """Stores snapshots downcast to single precision (2x smaller)."""
+
+    dtype = np.float32
+
+    def encode(self, data):
+        return data.astype(np.float32), 1.0
+
+    def decode(self, payload, scale):
+        return payload.astype(np.float64)
+
+
+class QuantizationCodec:
+    """Fixed-rate, error-bounded uniform quantization of snapshots.
+
+    Each snapshot is scaled by its maximum absolute value and rounded to
+    signed integers with the given number of bits, so the pointwise error
+    is at most ``max|u| / (2 * (2**(bits - 1) - 1))``. The rate is fixed,
+    which allows memory-mapped storage, and is 8x (8 bits) or 4x (16 bits)
+    smaller than double precision.
+
+    Attributes
+    ----------
+    bits: int
+        Number of bits per value. Either 8 or 16.
+    """
+
+    def __init__(self, bits=16):
+        if bits == 8:
+            self.dtype = np.int8
+        elif bits == 16:
+            self.dtype = np.int16
+        else:
+            raise ValueError(f"Quantization with {bits} bits not supported.")
+        self.bits = bits
+        self.levels = 2 ** (bits - 1) - 1
+
+    @classmethod
+    def from_tolerance(cls, relative_tolerance):
+        """Chooses the smallest number of bits whose error bound, relative to
+        the maximum absolute value of each snapshot, is below
+        ``relative_tolerance``."""
+        for bits in (8, 16):
+            if 1.0 / (2.0 * (2 ** (bits - 1) - 1)) <= relative_tolerance:
+                return cls(bits=bits)
+        raise ValueError(
+            f"Compression tolerance of {relative_tolerance} is too small "
+            "for quantization. Use float32 or no compression instead."
+        )
+
+    def error_bound(self, data):
+        """Maximum pointwise error when compressing ``data``."""
+        return np.max(np.abs(data), initial=0.0) / (2.0 * self.levels)
+
+    def encode(self, data):
+        max_abs = np.max(np.abs(data), initial=0.0)
+        if max_abs == 0.0:
+            return np.zeros(data.shape, dtype=self.dtype), 0.0
+        scale = max_abs / self.levels
+        payload = np.rint(data / scale).astype(self.dtype)
+        return payload, scale
+
+    def decode(self, payload, scale):
+        return payload.astype(np.float64) * scale
+
+
+def get_snapshot_codec(compression, tolerance=1e-3):
+    """Returns the codec for a snapshot compression option.
+
+    Parameters
+    ----------
+    compression: str or None
+        None for no compression, "float32" or "quantized".
+    tolerance: float
+        Pointwise error, relative to the maximum absolute value of each
+        snapshot, allowed by the "quantized" compression.
+
+    Returns
+    -------
+    codec: object or None
+        Codec with ``dtype``, ``encode`` and ``decode``, or None.
+    """
+    if compression is None:
+        return None
+    elif compression == "float32":
+        return Float32Codec()
+    elif compression == "quantized":
+        return QuantizationCodec.from_tolerance(tolerance)
+    else:
+        raise ValueError(f"Snapshot compression {compression} not supported.")
@@ -0,0 +1,203 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import firedrake as fire
+import numpy as np
+
+
+class SnapshotStore:
+    """Forward solution stored as NumPy arrays of the owned DOFs, optionally
+    compressed by a snapshot codec.
+
+    Snapshots are written in ``central_difference`` and consumed in
+    reverse order by the adjoint propagation, with the same ``pop()`` and
+    negative-index interface as the in-memory list of Functions. They are
+    decompressed into Functions on the fly.
+
+    Attributes
+    ----------
+    wave: spyro.Wave
+        Wave object that propagates the forward wave.
+    number_of_samples: int
+        Number of sampled snapshots in the forward propagation.
+    codec: object or None
+        Codec from ``snapshot_compression``. If None, snapshots are stored
+        in double precision.
+    """
+
+    def __init__(self, wave, number_of_samples, codec=None):
+        self.wave = wave
+        self.number_of_samples = number_of_samples
+        self.codec = codec
+
+        local_shape = wave.get_function().dat.data_ro.shape
+        dtype = np.float64 if codec is None else codec.dtype
+        self._data = self._allocate((number_of_samples,) + local_shape, dtype)
+        self._scales = np.ones(number_of_samples)
+
+        self._cache = {}
+        self._length = number_of_samples
+
+    def _allocate(self, shape, dtype):
+        return np.empty(shape, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        """Size in bytes of the stored snapshots."""
+        return self._data.nbytes
+
+    def store(self, sample):
+        """Stores the current wave function as snapshot ``sample``."""
+        self._store_data(sample, np.array(self.wave.get_function().dat.data_ro))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("Forward snapshot index out of range")
+        return self._get(index)
+
+    def pop(self):
+        snapshot = self[-1]
+        self._length -= 1
+        for sample in [k for k in self._cache if k >= self._length]:
+            del self._cache[sample]
+        if self._length == 0:
+            self.close()
+        return snapshot
+
+    def close(self):
+        """Releases the stored snapshots."""
+        self._data = None
+
+    def _store_data(self, sample, data):
+        if self.codec is None:
+            self._data[sample] = data
+        else:
+            self._data[sample], self._scales[sample] = self.codec.encode(data)
+
+    def _read(self, sample):
+        if self.codec is None:
+            return np.array(self._data[sample])
+        return self.codec.decode(self._data[sample], self._scales[sample])
+
+    def _load(self, sample):
+        return self._read(sample)
+
+    def _get(self, sample):
+        if sample in self._cache:
+            return self._cache[sample]
+
+        snapshot = fire.Function(
+            self.wave.function_space, name=self.wave.get_function_name()
+        )
+        snapshot.dat.data[:] = self._load(sample)
+        self._cache[sample] = snapshot
+
+        return snapshot
+
+
+class DiskSnapshotStore(SnapshotStore):
+    """Forward solution stored in a per-rank memory-mapped file instead of
+    a list of Firedrake Functions, so that the forward history does not
+    have to fit in RAM.
+
+    Optionally, a background thread writes (and compresses) snapshots
+    behind the forward propagation and reads the next ones ahead of the
+    adjoint propagation.
+
+    Attributes
+    ----------
+    file_name: str
+        Memory-mapped file holding the snapshots of this rank.
+    asynchronous: bool
+        Whether to use write-behind and read-ahead threads.
+    """
+
+    def __init__(
+        self,
+        wave,
+        number_of_samples,
+        codec=None,
+        directory=None,
+        asynchronous=True,
+    ):
+        self._data = None
+        self._executor = None
+        self._pending_writes = []
+        self._prefetched = {}
+        self.asynchronous = asynchronous
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        comm = wave.comm
+        prefix = (
+            f"forward_snapshots_ens{comm.ensemble_comm.rank}"
+            f"_rank{comm.comm.rank}_"
+        )
+        file_descriptor, self.file_name = tempfile.mkstemp(
+            prefix=prefix, suffix=".dat", dir=directory
+        )
+        os.close(file_descriptor)
+
+        super().__init__(wave, number_of_samples, codec=codec)
+
+        if asynchronous:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _allocate(self, shape, dtype):
+        return np.memmap(self.file_name, dtype=dtype, mode="w+", shape=shape)
+
+    def store(self, sample):
+        """Writes the current wave function as snapshot ``sample``."""
+        data = np.array(self.wave.get_function().dat.data_ro)
+        if self._executor is None:
+            self._store_data(sample, data)
+        else:
+            self._pending_writes.append(
+                self._executor.submit(self._store_data, sample, data)
+            )
+
+    def close(self):
+        """Stops the background thread and removes the snapshot file."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pending_writes = []
+        self._prefetched = {}
+        if self._data is not None:
+            self._data = None
+            if os.path.exists(self.file_name):
+                os.remove(self.file_name)
+
+    def __del__(self):
+        self.close()
+
+    def _load(self, sample):
+        if self._pending_writes:
+            for future in self._pending_writes:
+                future.result()
+            self._pending_writes = []
+            self._data.flush()
+
+        if sample in self._prefetched:
+            data = self._prefetched.pop(sample).result()
+        else:
+            data = self._read(sample)
+
+        # Snapshots are consumed in decreasing order
+        following = min([sample] + list(self._cache)) - 1
+        if (
+            self._executor is not None
+            and following >= 0
+            and following not in self._prefetched
+        ):
+            self._prefetched[following] = self._executor.submit(
+                self._read, following
+            )
+
+        return data
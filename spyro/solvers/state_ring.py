@@ -0,0 +1,64 @@
+import firedrake as fire
+
+
+def _coefficient_map(old, new):
+    """Maps a state Function, and its subfunctions if it is mixed, to
+    another Function in the same space."""
+    mapping = {old: new}
+    mapping.update(zip(old.split(), new.split()))
+    return mapping
+
+
+class StateRing:
+    """Ring buffer with the previous, current and next states of a three
+    level time integrator.
+
+    Instead of copying the current state into the previous one and the
+    next state into the current one every timestep, the three Functions
+    are rotated by reference. The right hand side form is compiled once
+    for each of the three possible positions of the states in the ring,
+    so that the form always reads the previous and current states.
+
+    Attributes
+    ----------
+    states: list of firedrake.Function
+        States in the ring, starting from the previous one.
+    rhs_forms: list of ufl.Form
+        Right hand side form for each rotation of the ring.
+    offset: int
+        Position of the previous state in the ring.
+    """
+
+    def __init__(self, rhs, prev_state, state, next_state):
+        self.states = [prev_state, state, next_state]
+        self.rhs_forms = [rhs]
+        for offset in (1, 2):
+            mapping = _coefficient_map(prev_state, self.states[offset])
+            mapping.update(
+                _coefficient_map(state, self.states[(offset + 1) % 3])
+            )
+            self.rhs_forms.append(fire.replace(rhs, mapping))
+        self.offset = 0
+
+    @property
+    def prev_state(self):
+        return self.states[self.offset]
+
+    @property
+    def state(self):
+        return self.states[(self.offset + 1) % 3]
+
+    @property
+    def next_state(self):
+        return self.states[(self.offset + 2) % 3]
+
+    @property
+    def rhs(self):
+        """Right hand side form that reads the current states."""
+        return self.rhs_forms[self.offset]
+
+    def rotate(self):
+        """The current state becomes the previous one and the next state
+        becomes the current one. The old previous state is reused as the
+        next state."""
+        self.offset = (self.offset + 1) % 3
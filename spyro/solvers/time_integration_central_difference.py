@@ -1,7 +1,11 @@
 import firedrake as fire
+import numpy as np
 
 from ..io.basicio import parallel_print
 from . import helpers
+from .checkpointing import CheckpointedForwardSolution
+from .snapshot_compression import get_snapshot_codec
+from .snapshot_store import SnapshotStore, DiskSnapshotStore
 from .. import utils
 
 
@@ -19,6 +23,7 @@ def central_difference(wave, source_id=0):
         tuple:
             A tuple containing the forward solution and the receiver output.
     """
+    rhs_forcing = None
     if wave.sources is not None:
         wave.sources.current_source = source_id
         rhs_forcing = fire.Cofunction(wave.function_space.dual())
@@ -27,47 +32,39 @@ def central_difference(wave, source_id=0):
     output_filename = filename + "sn" + str(source_id) + "." + file_extension
     if wave.forward_output:
         parallel_print(f"Saving output in: {output_filename}", wave.comm)
-    
+
     output = fire.File(output_filename, comm=wave.comm.comm)
     wave.comm.comm.barrier()
 
     t = wave.current_time
     nt = int(wave.final_time / wave.dt) + 1  # number of timesteps
-    
-    usol = [
-        fire.Function(wave.function_space, name=wave.get_function_name())
-        for t in range(nt)
-        if t % wave.gradient_sampling_frequency == 0
-    ]
-    usol_recv = []
+    number_of_samples = (nt - 1) // wave.gradient_sampling_frequency + 1
+
+    usol = create_forward_storage(wave, number_of_samples, rhs_forcing)
+    usol_recv = None
     save_step = 0
     for step in range(nt):
-        # Basic way of applying sources
-        wave.update_source_expression(t)
-        fire.assemble(wave.rhs, tensor=wave.B)
-
-        # More efficient way of applying sources
-        if wave.sources is not None:
-            f = wave.sources.apply_source(rhs_forcing, step)
-            B0 = wave.rhs_no_pml()
-            B0 += f
-        
-        wave.solver.solve(wave.next_vstate, wave.B)
+        central_difference_step(wave, step, rhs_forcing, t=t)
 
-        wave.prev_vstate = wave.vstate
-        wave.vstate = wave.next_vstate
-
-        usol_recv.append(wave.get_receivers_output())
+        receivers_output = wave.get_receivers_output()
+        if usol_recv is None:
+            usol_recv = np.empty((nt,) + np.shape(receivers_output))
+        usol_recv[step] = receivers_output
 
         if step % wave.gradient_sampling_frequency == 0:
-            usol[save_step].assign(wave.get_function())
+            if isinstance(usol, list):
+                usol[save_step].assign(wave.get_function())
+            else:
+                usol.store(save_step)
             save_step += 1
 
         if (step - 1) % wave.output_frequency == 0:
-            assert (
-                fire.norm(wave.get_function()) < 1
-            ), "Numerical instability. Try reducing dt or building the " \
-               "mesh differently"
+            helpers.check_stability(
+                wave.get_function(),
+                wave.comm,
+                check=wave.stability_check,
+                threshold=wave.stability_threshold,
+            )
             if wave.forward_output:
                 output.write(wave.get_function(), time=t,
                              name=wave.get_function_name())
@@ -75,17 +72,140 @@ def central_difference(wave, source_id=0):
             helpers.display_progress(wave.comm, t)
 
         t = step * float(wave.dt)
-    
+
     wave.current_time = t
     helpers.display_progress(wave.comm, t)
 
     usol_recv = helpers.fill(
         usol_recv, wave.receivers.is_local, nt, wave.receivers.number_of_points
     )
-    usol_recv = utils.utils.communicate(usol_recv, wave.comm)
+    usol_recv = utils.utils.communicate(usol_recv, wave.comm, inplace=True)
     wave.receivers_output = usol_recv
 
     wave.forward_solution = usol
     wave.forward_solution_receivers = usol_recv
 
     return usol, usol_recv
+
+
+def create_forward_storage(wave, number_of_samples, rhs_forcing=None):
+    """
+    Create the container for the sampled forward solution used by the
+    gradient calculation, based on the wave object forward_storage.
+
+    Parameters:
+    -----------
+    wave: Spyro object
+        The Wave object containing the necessary data and parameters.
+    number_of_samples: int
+        Number of sampled snapshots in the forward propagation.
+    rhs_forcing: firedrake.Cofunction (optional)
+        Auxiliary cofunction for the source injection, used when forward
+        segments are recomputed.
+
+    Returns:
+    --------
+    usol: list or snapshot container
+        Either a list of Functions or an object with the same pop() and
+        negative-index interface.
+    """
+    codec = get_snapshot_codec(
+        wave.snapshot_compression, tolerance=wave.compression_tolerance
+    )
+    if wave.forward_storage == "checkpointing":
+        return CheckpointedForwardSolution(
+            wave,
+            number_of_samples,
+            wave.number_of_checkpoints,
+            rhs_forcing=rhs_forcing,
+        )
+    elif wave.forward_storage == "disk":
+        return DiskSnapshotStore(
+            wave,
+            number_of_samples,
+            codec=codec,
+            directory=wave.snapshot_directory,
+            asynchronous=wave.asynchronous_snapshot_io,
+        )
+    elif codec is not None:
+        return SnapshotStore(wave, number_of_samples, codec=codec)
+    else:
+        return [
+            fire.Function(wave.function_space, name=wave.get_function_name())
+            for _ in range(number_of_samples)
+        ]
+
+
+def central_difference_step(wave, step, rhs_forcing, t=None):
+    """
+    Advance the wave state by one central difference timestep, from
+    ``vstate`` to ``next_vstate``, and rotate the state variables.
+
+    Parameters:
+    -----------
+    wave: Spyro object
+        The Wave object containing the necessary data and parameters.
+    step: int
+        Timestep number, used to index the source wavelet.
+    rhs_forcing: firedrake.Cofunction
+        Auxiliary cofunction for the source injection. Only used if the
+        wave object has sources.
+    t: float (optional)
+        Time passed to the source expression. If not given, uses the time
+        of the previous step, as in ``central_difference``.
+    """
+    if getattr(wave, "stiffness_matrix", None) is not None:
+        explicit_central_difference_step(wave, step, rhs_forcing)
+        return
+
+    if t is None:
+        t = max(step - 1, 0) * float(wave.dt)
+
+    # Basic way of applying sources
+    wave.update_source_expression(t)
+    fire.assemble(wave.rhs, tensor=wave.B)
+
+    # More efficient way of applying sources
+    if wave.sources is not None:
+        f = wave.sources.apply_source(rhs_forcing, step)
+        B0 = wave.rhs_no_pml()
+        B0 += f
+
+    wave.solver.solve(wave.next_vstate, wave.B)
+
+    wave.rotate_states()
+
+
+def explicit_central_difference_step(wave, step, rhs_forcing):
+    """
+    Advance the wave state by one central difference timestep using the
+    operators pre-assembled by ``construct_explicit_operators``, i.e.
+    ``u_np1 = 2 u_n - u_nm1 + D^-1 (f - K u_n)``. Only used for mass
+    lumped methods without PML and without a UFL source expression.
+
+    Parameters:
+    -----------
+    wave: Spyro object
+        The Wave object containing the necessary data and parameters.
+    step: int
+        Timestep number, used to index the source wavelet.
+    rhs_forcing: firedrake.Cofunction
+        Auxiliary cofunction for the source injection. Only used if the
+        wave object has sources.
+    """
+    B = wave.B
+    with wave.u_n.dat.vec_ro as u_n, B.dat.vec_wo as b:
+        wave.stiffness_matrix.mult(u_n, b)
+        b.scale(-1.0)
+
+    if wave.sources is not None:
+        f = wave.sources.apply_source(rhs_forcing, step)
+        B += f
+
+    wave.u_np1.dat.data[:] = (
+        2.0 * wave.u_n.dat.data_ro
+        - wave.u_nm1.dat.data_ro
+        + wave.inverse_mass_diagonal.dat.data_ro * B.dat.data_ro
+    )
+
+    wave.rotate_states()
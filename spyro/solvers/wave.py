@@ -9,6 +9,7 @@ from .time_integration_central_difference import central_difference as time_inte
 from ..domains.quadrature import quadrature_rules
 from ..io import Model_parameters, interpolate
 from ..io.basicio import ensemble_propagator
+from ..io.shot_scheduler import has_multiple_shots_per_member
 from .. import utils
 from ..receivers.Receivers import Receivers
 from ..sources.Sources import Sources
@@ -34,7 +35,11 @@ class Wave(Model_parameters, metaclass=ABCMeta):
     solver_parameters: Python object
         Contains solver parameters
     real_shot_record: firedrake function
-        Real shot record
+        Real shot record. If ensemble members run more than one shot, an
+        object indexed by shot number.
+    shot_records: dict
+        Receiver records of the shots run by this ensemble member in the
+        last forward propagation, by shot number.
     mesh: firedrake mesh
         Mesh used in the simulation (2D or 3D)
     mesh_z: symbolic coordinate z of the mesh object
@@ -44,6 +49,9 @@ class Wave(Model_parameters, metaclass=ABCMeta):
         Contains information about sources
     receivers: Receivers object
         Contains information about receivers
+    state_ring: StateRing object
+        Previous, current and next states, rotated by reference every
+        timestep. None if the states are rotated by copies
 
     Methods:
     --------
@@ -72,6 +80,7 @@ class Wave(Model_parameters, metaclass=ABCMeta):
 
         self.function_space = None
         self.forward_solution_receivers = None
+        self.shot_records = {}
         self.current_time = 0.0
         self.set_solver_parameters()
 
@@ -90,6 +99,10 @@ class Wave(Model_parameters, metaclass=ABCMeta):
         self.source_expression = None
         # Object for efficient application of sources
         self.sources = None
+        # Ring buffer of states for rotation without copies
+        self.state_ring = None
+        # Dependencies of the built operators, to reuse them when possible
+        self.operator_key = None
 
     def forward_solve(self):
         """Solves the forward problem."""
@@ -311,7 +324,10 @@ class Wave(Model_parameters, metaclass=ABCMeta):
     def set_last_solve_as_real_shot_record(self):
         if self.current_time == 0.0:
             raise ValueError("No previous solve to set as real shot record.")
-        self.real_shot_record = self.forward_solution_receivers
+        if has_multiple_shots_per_member(self):
+            self.real_shot_record = dict(self.shot_records)
+        else:
+            self.real_shot_record = self.forward_solution_receivers
     
     @abstractmethod
     def _set_vstate(self, vstate):
@@ -337,6 +353,36 @@ class Wave(Model_parameters, metaclass=ABCMeta):
     def _get_next_vstate(self):
         pass
 
+    @abstractmethod
+    def _set_state_references(self, prev_vstate, vstate, next_vstate):
+        """Rebinds the state variables to the Functions of the state
+        ring."""
+        pass
+
+    def reset_states(self):
+        """Zeroes the time integration states and rewinds the time, so
+        that the next propagation starts from rest."""
+        self.current_time = 0.0
+        if self.state_ring is not None:
+            for state in self.state_ring.states:
+                state.assign(0.0)
+
+    def rotate_states(self):
+        """Moves the current state to the previous one and the next state
+        to the current one. With a state ring, only references are
+        rotated and the right hand side form is swapped accordingly;
+        otherwise the states are copied."""
+        if self.state_ring is None:
+            self.prev_vstate = self.vstate
+            self.vstate = self.next_vstate
+            return
+
+        ring = self.state_ring
+        ring.rotate()
+        self.rhs = ring.rhs
+        self._set_state_references(ring.prev_state, ring.state,
+                                   ring.next_state)
+
     # Managed attributes to access state variables in current, previous and next iteration
     vstate = property(fget=lambda self: self._get_vstate(),
                       fset=lambda self, value: self._set_vstate(value))
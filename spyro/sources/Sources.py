@@ -1,6 +1,7 @@
 import math
 import numpy as np
 from scipy.signal import butter, filtfilt
+from scipy.sparse import csr_matrix
 from spyro.receivers.dirac_delta_projector import Delta_projector
 
 
@@ -32,15 +33,26 @@ class Sources(Delta_projector):
         spatial paralelism
     wavelet: list of floats
         Values at timesteps of wavelet used in the simulation
+    source_rows: list of numpy arrays
+        Entries of the flattened right hand side touched by each source
+    source_weights: list of numpy arrays
+        Precomputed spatial weights of each source on those entries
+    source_signals: numpy array or None
+        Signals, of shape (number of timesteps, number of sources), of
+        sources fired simultaneously. If None only current_source is fired
+        with the wavelet.
 
     Methods
     -------
     build_maps()
         Calculates and stores tabulations for interpolation
+        and the spatial weights of each source
     interpolate(field)
         Interpolates field value at receiver locations
     apply_source(rhs_forcing, value)
         Applies value at source locations in rhs_forcing operator
+    set_simultaneous_sources(weights, wavelets)
+        Fires several (encoded) sources in the same propagation
     """
 
     def __init__(self, wave_object):
@@ -70,12 +82,90 @@ class Sources(Delta_projector):
         self.amplitude = wave_object.amplitude
         self.is_local = [0] * self.number_of_points
         self.current_source = None
+        self.source_signals = None
         self.update_wavelet(wave_object)
         if np.isscalar(self.amplitude) or (self.amplitude.size <= 3):
             self.build_maps(order=0)
         else:
             self.build_maps(order=1)
 
+    def build_maps(self, order=0):
+        """Calculates and stores tabulations for interpolation and the
+        spatial weights used to inject each source. Only has to be called
+        again if a mesh related attribute changes.
+        """
+        super().build_maps(order=order)
+
+        value_size = np.size(
+            np.dot(self.amplitude, self.cell_tabulations[0][0])
+        )
+        rows = []
+        weights = []
+        for source_id in range(self.number_of_points):
+            if self.is_local[source_id] is None:
+                rows.append(np.zeros((0,), dtype=np.int64))
+                weights.append(np.zeros((0,)))
+                continue
+            nodes = self.node_indices[source_id]
+            source_weights = np.array([
+                np.dot(self.amplitude, tabulation)
+                for tabulation in self.cell_tabulations[source_id]
+            ])
+            # Rows of the flattened (possibly vector valued) dat
+            rows.append(
+                (nodes[:, None] * value_size
+                 + np.arange(value_size)[None, :]).ravel()
+            )
+            weights.append(source_weights.ravel())
+
+        self.source_rows = rows
+        self.source_weights = weights
+
+        # Injection of all sources at once: one column per source acting
+        # on the union of the rows touched by any source
+        self.source_matrix_rows = np.unique(np.concatenate(rows))
+        columns = np.concatenate([
+            np.full(len(source_rows), source_id, dtype=np.int64)
+            for source_id, source_rows in enumerate(rows)
+        ])
+        self.source_matrix = csr_matrix(
+            (
+                np.concatenate(weights),
+                (np.searchsorted(self.source_matrix_rows, np.concatenate(rows)),
+                 columns),
+            ),
+            shape=(len(self.source_matrix_rows), self.number_of_points),
+        )
+
+    def set_simultaneous_sources(self, weights=None, wavelets=None):
+        """Fires several sources in the same propagation, as in blended or
+        encoded shots. Calling it without arguments goes back to firing
+        only current_source.
+
+        Parameters
+        ----------
+        weights: array-like (optional)
+            Scaling of each source, of shape (number of sources,), e.g.
+            random signs for source encoding. Defaults to one for every
+            source.
+        wavelets: array-like (optional)
+            Signal of each source, of shape (number of sources, number of
+            timesteps), e.g. randomly phase shifted wavelets. Defaults to
+            the wavelet for every source.
+        """
+        if weights is None and wavelets is None:
+            self.source_signals = None
+            return
+
+        if wavelets is None:
+            wavelets = np.tile(self.wavelet, (self.number_of_points, 1))
+        wavelets = np.asarray(wavelets, dtype=float)
+        if weights is not None:
+            wavelets = wavelets * np.asarray(weights, dtype=float)[:, None]
+        if wavelets.shape[0] != self.number_of_points:
+            raise ValueError("Expected one signal per source.")
+        self.source_signals = np.ascontiguousarray(wavelets.T)
+
     def update_wavelet(self, wave_object):
         self.wavelet = full_ricker_wavelet(
             dt=wave_object.dt,
@@ -100,15 +190,17 @@ class Sources(Delta_projector):
         rhs_forcing: Firedrake.Function
             The right hand side of the wave equation with the source applied
         """
-        for source_id in range(self.number_of_points):
-            if self.is_local[source_id] and source_id == self.current_source:
-                for i in range(len(self.cellNodeMaps[source_id])):
-                    rhs_forcing.dat.data_with_halos[
-                        int(self.cellNodeMaps[source_id][i])
-                    ] = (self.wavelet[step] * np.dot(self.amplitude, self.cell_tabulations[source_id][i]))
-            else:
-                for i in range(len(self.cellNodeMaps[source_id])):
-                    tmp = rhs_forcing.dat.data_with_halos[0]  # noqa: F841
+        # Every core accesses the halos, even without local sources
+        data = rhs_forcing.dat.data_with_halos.reshape(-1)
+        if self.source_signals is not None:
+            data[self.source_matrix_rows] = (
+                self.source_matrix @ self.source_signals[step]
+            )
+        else:
+            rows = self.source_rows[self.current_source]
+            data[rows] = self.wavelet[step] * self.source_weights[
+                self.current_source
+            ]
 
         return rhs_forcing
 
@@ -1,6 +1,9 @@
 from . import geometry_creation, estimate_timestep
 from .utils import mpi_init, compute_functional, Mask, Gradient_mask_for_pml
 from .analytical_solution_nodal import nodal_homogeneous_analytical
+from .gradient_reduction import reduce_gradient
+from .misfit import MisfitFunction
+from .source_encoding import SourceEncoding
 
 
 __all__ = [
@@ -11,4 +14,7 @@ __all__ = [
     "nodal_homogeneous_analytical",
     "Mask",
     "Gradient_mask_for_pml",
+    "reduce_gradient",
+    "MisfitFunction",
+    "SourceEncoding",
 ]
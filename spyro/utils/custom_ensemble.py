@@ -0,0 +1,167 @@
+import numpy as np
+from mpi4py import MPI
+import firedrake as fire
+
+
+class MemberComm:
+    """Communicator-like view of the members of a ``CustomEnsemble``.
+
+    ``rank`` and ``size`` are the index of the member and the number of
+    members on every core, as for the ensemble communicator of a
+    Firedrake ``Ensemble``. Collective operations are done by the first
+    core of each member and broadcast to the other cores of the member.
+
+    Attributes
+    ----------
+    rank: int
+        Index of the ensemble member of this core.
+    size: int
+        Number of ensemble members.
+    spatial_comm: mpi4py.MPI.Comm
+        Communicator of the cores of this member.
+    leaders_comm: mpi4py.MPI.Comm or None
+        Communicator of the first core of each member. Only set on those
+        cores.
+    """
+
+    def __init__(self, spatial_comm, leaders_comm, rank, size):
+        self.spatial_comm = spatial_comm
+        self.leaders_comm = leaders_comm
+        self.rank = rank
+        self.size = size
+
+    @property
+    def is_leader(self):
+        return self.spatial_comm.rank == 0
+
+    def barrier(self):
+        if self.is_leader:
+            self.leaders_comm.barrier()
+        self.spatial_comm.barrier()
+
+    def bcast(self, obj, root=0):
+        if self.is_leader:
+            obj = self.leaders_comm.bcast(obj, root=root)
+        return self.spatial_comm.bcast(obj, root=0)
+
+    def allreduce(self, obj, op=MPI.SUM):
+        result = None
+        if self.is_leader:
+            result = self.leaders_comm.allreduce(obj, op=op)
+        return self.spatial_comm.bcast(result, root=0)
+
+    def allgather(self, obj):
+        result = None
+        if self.is_leader:
+            result = self.leaders_comm.allgather(obj)
+        return self.spatial_comm.bcast(result, root=0)
+
+    def Allreduce(self, sendbuf, recvbuf, op=MPI.SUM):
+        if self.is_leader:
+            self.leaders_comm.Allreduce(sendbuf, recvbuf, op=op)
+        self.spatial_comm.Bcast(recvbuf, root=0)
+
+    def Bcast(self, buf, root=0):
+        if self.is_leader:
+            self.leaders_comm.Bcast(buf, root=root)
+        self.spatial_comm.Bcast(buf, root=0)
+
+
+class CustomEnsemble:
+    """Ensemble whose members have different numbers of cores, so that
+    expensive shots can be given more cores than cheap ones. It has the
+    ``global_comm``, ``comm`` and ``ensemble_comm`` attributes of a
+    Firedrake ``Ensemble``.
+
+    As the meshes of the members are partitioned differently, Functions
+    are reduced across members in a numbering given by sorting the DOF
+    coordinates, which does not depend on the partition. This gathers
+    the whole Function on every core.
+
+    Attributes
+    ----------
+    global_comm: mpi4py.MPI.Comm
+        Communicator of all cores.
+    comm: mpi4py.MPI.Comm
+        Communicator of the cores of this member, used for the mesh.
+    ensemble_comm: MemberComm
+        Communicator-like object across the members.
+    cores_per_member: list of int
+        Number of cores of each member.
+    """
+
+    def __init__(self, global_comm, cores_per_member):
+        cores_per_member = [int(cores) for cores in cores_per_member]
+        if sum(cores_per_member) != global_comm.size:
+            raise ValueError(
+                f"Custom cores per shot {cores_per_member} do not add up to "
+                f"the {global_comm.size} available cores."
+            )
+        if min(cores_per_member) < 1:
+            raise ValueError("Every shot needs at least one core.")
+
+        self.global_comm = global_comm
+        self.cores_per_member = cores_per_member
+        member = int(
+            np.searchsorted(
+                np.cumsum(cores_per_member), global_comm.rank, side="right"
+            )
+        )
+        self.comm = global_comm.Split(color=member, key=global_comm.rank)
+        leaders_comm = global_comm.Split(
+            color=0 if self.comm.rank == 0 else MPI.UNDEFINED,
+            key=global_comm.rank,
+        )
+        if leaders_comm == MPI.COMM_NULL:
+            leaders_comm = None
+        self.ensemble_comm = MemberComm(
+            self.comm, leaders_comm, member, len(cores_per_member)
+        )
+        self._permutations = {}
+
+    def _canonical_permutation(self, V):
+        if V not in self._permutations:
+            mesh = V.mesh()
+            W = fire.VectorFunctionSpace(mesh, V.ufl_element())
+            coordinates = fire.Function(W).interpolate(mesh.coordinates)
+            points = coordinates.vector().gather().reshape(
+                (-1, mesh.geometric_dimension())
+            )
+            self._permutations[V] = np.lexsort(np.round(points, 10).T[::-1])
+        return self._permutations[V]
+
+    def allreduce(self, f, f_reduced, op=MPI.SUM):
+        """Reduces a scalar Function across the ensemble members.
+
+        Parameters
+        ----------
+        f: firedrake.Function
+            Function of this member.
+        f_reduced: firedrake.Function
+            Function, in the same space, where the result is written.
+        op: mpi4py.MPI.Op
+            Reduction operation.
+
+        Returns
+        -------
+        f_reduced: firedrake.Function
+        """
+        values = self.canonical_values(f)
+        self.ensemble_comm.Allreduce(MPI.IN_PLACE, values, op=op)
+        return self.set_canonical_values(f_reduced, values)
+
+    def canonical_values(self, f):
+        """Values of all DOFs of a scalar Function, in the numbering that
+        is the same for every member."""
+        permutation = self._canonical_permutation(f.function_space())
+        return np.ascontiguousarray(f.vector().gather()[permutation])
+
+    def set_canonical_values(self, f, values):
+        """Writes values given by ``canonical_values`` into ``f``."""
+        permutation = self._canonical_permutation(f.function_space())
+        reordered = np.empty_like(values)
+        reordered[permutation] = values
+        with f.dat.vec_wo as vec:
+            start, end = vec.getOwnershipRange()
+            vec.array[:] = reordered[start:end]
+        return f
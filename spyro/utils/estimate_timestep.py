@@ -1,65 +1,168 @@
-import scipy
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
+from mpi4py import MPI
+from scipy.linalg import eigvalsh_tridiagonal
 
 import firedrake as fd
+from firedrake.petsc import PETSc
 from firedrake import dot, grad
 import finat
 
 
-def estimate_timestep(mesh, V, c, estimate_max_eigenvalue=True):
+_timestep_cache = OrderedDict()
+timestep_cache_size = 32
+
+
+def clear_timestep_cache():
+    """Removes all cached timestep estimates."""
+    _timestep_cache.clear()
+
+
+def _fingerprint(mesh, V, c, estimate_max_eigenvalue):
+    """Local hash of the mesh coordinates, element and velocity model. Returns
+    None if the velocity is a UFL expression that can not be hashed."""
+    digest = hashlib.sha1(mesh.coordinates.dat.data_ro.tobytes())
+    digest.update(str(V.ufl_element()).encode())
+    if isinstance(c, fd.Function):
+        digest.update(str(c.function_space().ufl_element()).encode())
+        digest.update(c.dat.data_ro.tobytes())
+    elif isinstance(c, (fd.Constant, float, int)):
+        digest.update(repr(float(c)).encode())
+    else:
+        return None
+    return (digest.hexdigest(), bool(estimate_max_eigenvalue))
+
+
+def _largest_eigenvalue(K, inv_sqrt_mass, tolerance, max_iterations):
+    """Largest eigenvalue of ``D^-1/2 K D^-1/2`` by the Lanczos method,
+    using only matrix-vector products with distributed PETSc Vecs."""
+    q = K.createVecRight()
+    q.setRandom()
+    q.normalize()
+    q_prev = q.duplicate()
+    q_prev.set(0.0)
+    w = q.duplicate()
+    tmp = q.duplicate()
+
+    alphas = []
+    betas = []
+    eigenvalue = 0.0
+    beta = 0.0
+    for iteration in range(max_iterations):
+        tmp.pointwiseMult(q, inv_sqrt_mass)
+        K.mult(tmp, w)
+        w.pointwiseMult(w, inv_sqrt_mass)
+
+        alpha = w.dot(q)
+        w.axpy(-alpha, q)
+        w.axpy(-beta, q_prev)
+        alphas.append(alpha)
+        beta = w.norm()
+
+        converged = beta <= tolerance * abs(alpha)
+        if (iteration + 1) % 10 == 0 or converged:
+            previous = eigenvalue
+            n = len(alphas)
+            eigenvalue = eigvalsh_tridiagonal(
+                np.array(alphas), np.array(betas),
+                select="i", select_range=(n - 1, n - 1),
+            )[0]
+            if abs(eigenvalue - previous) <= tolerance * abs(eigenvalue):
+                converged = True
+        if converged:
+            break
+
+        betas.append(beta)
+        q.copy(q_prev)
+        w.copy(q)
+        q.scale(1.0 / beta)
+
+    return eigenvalue
+
+
+def estimate_timestep(
+    mesh,
+    V,
+    c,
+    estimate_max_eigenvalue=True,
+    tolerance=1e-10,
+    max_iterations=2000,
+    use_cache=True,
+):
     """
     Estimate the maximum stable timestep based on the spectral radius
-    using optionally the Gershgorin Circle Theorem to estimate the
-    maximum generalized eigenvalue. Otherwise computes the maximum
-    generalized eigenvalue exactly.
+    of the generalized eigenvalue problem ``K x = lambda M x``, with the
+    lumped mass matrix ``M``. The maximum eigenvalue is either bounded by
+    the maximum diagonal entry of ``M^-1 K`` or computed by the Lanczos
+    method. Both run in parallel without assembling ``M^-1 K``.
 
     Parameters
     ----------
+    mesh: firedrake.Mesh
+        Mesh of the function space.
+    V: firedrake.FunctionSpace
+        Function space of the wave solution.
+    c: firedrake.Function, firedrake.Constant or float
+        Velocity model.
+    estimate_max_eigenvalue: bool
+        If True, uses the maximum diagonal entry of ``M^-1 K``. Otherwise
+        computes the maximum eigenvalue.
+    tolerance: float
+        Relative tolerance of the computed maximum eigenvalue.
+    max_iterations: int
+        Maximum number of Lanczos iterations.
+    use_cache: bool
+        If True, reuses the estimate of a previous call with the same mesh
+        coordinates, element and velocity values.
+
+    Returns
+    -------
+    max_dt: float
+        Maximum stable timestep.
     """
+    key = None
+    if use_cache:
+        key = _fingerprint(mesh, V, c, estimate_max_eigenvalue)
+        # Every rank has to take the same branch of the collective solves
+        cached = mesh.comm.allreduce(key in _timestep_cache, op=MPI.LAND)
+        if cached:
+            _timestep_cache.move_to_end(key)
+            return _timestep_cache[key]
 
     u, v = fd.TrialFunction(V), fd.TestFunction(V)
     quad_rule = finat.quadrature.make_quadrature(
         V.finat_element.cell, V.ufl_element().degree(), "KMV"
     )
     dxlump = fd.dx(scheme=quad_rule)
-    A = fd.assemble(u * v * dxlump)
-    ai, aj, av = A.petscmat.getValuesCSR()
-    av_inv = []
-    for value in av:
-        if value == 0:
-            av_inv.append(0.0)
-        else:
-            av_inv.append(1 / value)
-    Asp = scipy.sparse.csr_matrix((av, aj, ai))
-    Asp_inv = scipy.sparse.csr_matrix((av_inv, aj, ai))
-
-    K = fd.assemble(c * c * dot(grad(u), grad(v)) * dxlump)
-    ai, aj, av = K.petscmat.getValuesCSR()
-    Ksp = scipy.sparse.csr_matrix((av, aj, ai))
-
-    # operator
-    Lsp = Asp_inv.multiply(Ksp)
+    mass_diagonal = fd.assemble(v * dxlump)
+
+    K = fd.assemble(c * c * dot(grad(u), grad(v)) * dxlump).petscmat
+
+    with mass_diagonal.dat.vec_ro as mass_vec:
+        inv_mass = mass_vec.copy()
+    inv_mass.reciprocal()
+
     if estimate_max_eigenvalue:
         # absolute maximum of diagonals
-        max_eigval = np.amax(np.abs(Lsp.diagonal()))
+        diagonal = K.getDiagonal()
+        diagonal.pointwiseMult(diagonal, inv_mass)
+        max_eigval = diagonal.norm(PETSc.NormType.INFINITY)
     else:
-        print(
-            "Computing exact eigenvalues is extremely computationally \
-                demanding!",
-            flush=True,
+        inv_mass.sqrtabs()
+        max_eigval = _largest_eigenvalue(
+            K, inv_mass, tolerance, max_iterations
         )
-        max_eigval = scipy.sparse.linalg.eigs(
-            Ksp, M=Asp, k=1, which="LM", return_eigenvectors=False
-        )[0]
 
-    # print(max_eigval)
-    if np.sqrt(max_eigval) > 0.0:
+    if max_eigval > 0.0:
         max_dt = float(2 / np.sqrt(max_eigval))
     else:
         max_dt = 100000000
-    # print(
-    #    f"Maximum stable timestep should be about: {np.float(2 /
-    # np.sqrt(max_eigval))} seconds",
-    #    flush=True,
-    # )
+
+    if key is not None:
+        _timestep_cache[key] = max_dt
+        while len(_timestep_cache) > timestep_cache_size:
+            _timestep_cache.popitem(last=False)
+
     return max_dt
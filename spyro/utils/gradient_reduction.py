@@ -0,0 +1,51 @@
+import numpy as np
+from mpi4py import MPI
+import firedrake as fire
+
+from .custom_ensemble import CustomEnsemble
+
+
+def reduce_gradient(comm, gradient, functional=None):
+    """Sums the gradients (and functionals) of the ensemble members.
+
+    The gradient of a member, already summed over its shots, is packed
+    with its functional into one buffer, which is reduced across the
+    members by a single collective, instead of synchronizing with
+    barriers and separate reductions for the gradient and the functional.
+
+    Parameters
+    ----------
+    comm: firedrake.Ensemble or CustomEnsemble
+        Ensemble communicator.
+    gradient: firedrake.Function
+        Gradient of this ensemble member.
+    functional: float (optional)
+        Functional of this ensemble member, reduced with the gradient.
+
+    Returns
+    -------
+    gradient: firedrake.Function
+        Sum of the gradients of the members.
+    functional: float or None
+        Sum of the functionals of the members, if they were given.
+    """
+    if isinstance(comm, CustomEnsemble):
+        values = comm.canonical_values(gradient)
+    else:
+        # Members of a Firedrake Ensemble are partitioned alike
+        values = gradient.dat.data_ro
+    buffer = np.empty(len(values) + 1)
+    buffer[:-1] = values
+    # Every core of a member has the same functional
+    buffer[-1] = 0.0 if functional is None else functional
+    comm.ensemble_comm.Allreduce(MPI.IN_PLACE, buffer, op=MPI.SUM)
+
+    reduced = fire.Function(gradient.function_space())
+    if isinstance(comm, CustomEnsemble):
+        comm.set_canonical_values(reduced, buffer[:-1])
+    else:
+        reduced.dat.data[:] = buffer[:-1]
+
+    if functional is not None:
+        functional = float(buffer[-1])
+    return reduced, functional
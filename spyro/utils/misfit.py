@@ -0,0 +1,173 @@
+import numpy as np
+from scipy.signal import hilbert
+
+
+def _inner(a, b, dt):
+    """Time integral of the product of two records, per receiver."""
+    return np.trapz(a * b, dx=dt, axis=0)
+
+
+def _norm(a, dt):
+    return np.sqrt(_inner(a, a, dt))
+
+
+def _quadrature_weights(number_of_timesteps):
+    """Weights of the trapezoidal rule, which halves the first and last
+    samples. The adjoint sources carry them to be the exact derivative of
+    the integrated functionals."""
+    weights = np.ones((number_of_timesteps, 1))
+    weights[[0, -1]] = 0.5
+    return weights
+
+
+def l2_misfit(guess, observed, dt, epsilon):
+    """Least squares misfit, ``0.5 * int (d - s)^2 dt``."""
+    residual = observed - guess
+    adjoint_source = _quadrature_weights(guess.shape[0]) * residual
+    return 0.5 * _inner(residual, residual, dt), adjoint_source
+
+
+def cross_correlation_misfit(guess, observed, dt, epsilon):
+    """Zero lag normalized cross-correlation misfit,
+    ``1 - <s, d> / (|s| |d|)``, which does not depend on the amplitudes
+    of the traces."""
+    guess_norm = _norm(guess, dt) + epsilon
+    observed_norm = _norm(observed, dt) + epsilon
+    correlation = _inner(guess, observed, dt) / (guess_norm * observed_norm)
+    adjoint_source = _quadrature_weights(guess.shape[0]) * (
+        observed / observed_norm - correlation * guess / guess_norm
+    ) / guess_norm
+    return 1.0 - correlation, adjoint_source
+
+
+def envelope_misfit(guess, observed, dt, epsilon):
+    """Least squares misfit of the envelopes of the traces,
+    ``0.5 * int (E(s) - E(d))^2 dt``, with ``E(s) = |s + i H(s)|``."""
+    guess_hilbert = np.imag(hilbert(guess, axis=0))
+    guess_envelope = np.sqrt(guess**2 + guess_hilbert**2) + epsilon
+    observed_envelope = np.abs(hilbert(observed, axis=0))
+    difference = guess_envelope - observed_envelope
+    # The Hilbert transform is anti-self-adjoint for plain sums, so the
+    # end weights of the trapezoidal rule are applied before it
+    weights = _quadrature_weights(guess.shape[0])
+    weighted = weights * difference / guess_envelope
+    adjoint_source = np.imag(hilbert(weighted * guess_hilbert, axis=0))
+    adjoint_source -= weighted * guess
+    return 0.5 * _inner(difference, difference, dt), adjoint_source
+
+
+def trace_normalized_misfit(guess, observed, dt, epsilon):
+    """Least squares misfit of the traces divided by their norms,
+    ``0.5 * int (s / |s| - d / |d|)^2 dt``."""
+    guess_norm = _norm(guess, dt) + epsilon
+    normalized_guess = guess / guess_norm
+    residual = observed / (_norm(observed, dt) + epsilon) - normalized_guess
+    adjoint_source = _quadrature_weights(guess.shape[0]) * (
+        residual - normalized_guess * _inner(normalized_guess, residual, dt)
+    ) / guess_norm
+    return 0.5 * _inner(residual, residual, dt), adjoint_source
+
+
+misfit_functions = {
+    "l2": l2_misfit,
+    "cross_correlation": cross_correlation_misfit,
+    "envelope": envelope_misfit,
+    "trace_normalized": trace_normalized_misfit,
+}
+
+
+class MisfitFunction:
+    """Objective function of the inversion, evaluated for all receivers of
+    a shot at once.
+
+    ``evaluate`` returns the functional and the adjoint source, which is
+    injected at the receivers by the adjoint propagation. The adjoint
+    source follows the sign and scaling of the L2 residual ``d - s``,
+    that is, it is ``-1/dt`` times the derivative of the functional with
+    respect to the samples of the guess record. As the functionals are
+    integrated with the trapezoidal rule, the first and last samples of
+    the adjoint source carry a weight of 0.5.
+
+    Attributes
+    ----------
+    misfit_type: str
+        "l2", "cross_correlation", "envelope" or "trace_normalized".
+    time_window: tuple or numpy.ndarray or None
+        Start and end times, in seconds, of the part of the records that
+        is compared, or an array of time weights with shape (timesteps,)
+        or (timesteps, receivers).
+    receiver_weights: numpy.ndarray or None
+        Weight of each receiver in the functional.
+    epsilon: float
+        Added to norms and envelopes to avoid divisions by zero.
+    """
+
+    def __init__(
+        self,
+        misfit_type="l2",
+        time_window=None,
+        receiver_weights=None,
+        epsilon=1e-12,
+    ):
+        if misfit_type not in misfit_functions:
+            raise ValueError(
+                f"Misfit {misfit_type} not supported. Options are "
+                f"{list(misfit_functions)}."
+            )
+        self.misfit_type = misfit_type
+        self.time_window = time_window
+        if receiver_weights is not None:
+            receiver_weights = np.asarray(receiver_weights, dtype=float)
+        self.receiver_weights = receiver_weights
+        self.epsilon = epsilon
+
+    def _window(self, number_of_timesteps, dt):
+        if self.time_window is None:
+            return None
+        time_window = self.time_window
+        if isinstance(time_window, (tuple, list)) and len(time_window) == 2:
+            start, end = time_window
+            times = np.arange(number_of_timesteps) * dt
+            window = ((times >= start) & (times <= end)).astype(float)
+        else:
+            window = np.asarray(time_window, dtype=float)
+        if window.ndim == 1:
+            window = window[:, np.newaxis]
+        return window
+
+    def evaluate(self, guess, observed, dt):
+        """Functional and adjoint source of one shot.
+
+        Parameters
+        ----------
+        guess: numpy.ndarray
+            Modelled receiver record, with shape (timesteps, receivers).
+        observed: numpy.ndarray
+            Observed receiver record, with the same shape.
+        dt: float
+            Timestep of the records.
+
+        Returns
+        -------
+        functional: float
+            Misfit of the shot.
+        adjoint_source: numpy.ndarray
+            Adjoint source, with the shape of the records.
+        """
+        guess = np.asarray(guess)
+        observed = np.asarray(observed)
+        window = self._window(guess.shape[0], dt)
+        if window is not None:
+            guess = window * guess
+            observed = window * observed
+
+        misfits, adjoint_source = misfit_functions[self.misfit_type](
+            guess, observed, dt, self.epsilon
+        )
+
+        if self.receiver_weights is not None:
+            misfits = self.receiver_weights * misfits
+            adjoint_source = self.receiver_weights * adjoint_source
+        if window is not None:
+            adjoint_source = window * adjoint_source
+        return float(np.sum(misfits)), adjoint_source
@@ -0,0 +1,96 @@
+import numpy as np
+from scipy.signal import hilbert
+
+
+class SourceEncoding:
+    """Random codes that blend all the sources of an acquisition into one
+    encoded supershot.
+
+    Source ``i`` is fired with ``a_i w + b_i H(w)``, where ``w`` is the
+    wavelet and ``H`` the Hilbert transform in time. For "random_sign"
+    encoding ``a_i`` is a random sign and ``b_i`` is zero. For
+    "random_phase" encoding the wavelet is rotated by a random phase
+    ``phi_i``, with ``a_i = cos(phi_i)`` and ``b_i = -sin(phi_i)``. As the
+    wave equation is linear and time invariant, the record of the
+    supershot is the sum of the shot records encoded the same way.
+
+    Attributes
+    ----------
+    encoding_type: str
+        "random_sign" or "random_phase".
+    number_of_sources: int
+        Number of sources in the acquisition.
+    realization: int
+        Number of codes drawn so far.
+    codes: numpy.ndarray
+        Coefficients ``a`` and ``b`` of each source, with shape
+        (2, number_of_sources).
+    """
+
+    def __init__(self, encoding_type, number_of_sources, seed=None):
+        """
+        Parameters
+        ----------
+        encoding_type: str
+            "random_sign" or "random_phase".
+        number_of_sources: int
+            Number of sources in the acquisition.
+        seed: int or sequence of int (optional)
+            Seed of the random codes. Cores that fire the same supershot
+            need the same seed.
+        """
+        if encoding_type not in ("random_sign", "random_phase"):
+            raise ValueError(f"Source encoding {encoding_type} not supported.")
+        self.encoding_type = encoding_type
+        self.number_of_sources = number_of_sources
+        self.realization = 0
+        self.codes = None
+        self._rng = np.random.default_rng(seed)
+
+    def draw(self):
+        """Draws new random codes."""
+        n = self.number_of_sources
+        if self.encoding_type == "random_sign":
+            signs = self._rng.choice([-1.0, 1.0], size=n)
+            self.codes = np.stack([signs, np.zeros(n)])
+        else:
+            phases = self._rng.uniform(0.0, 2.0 * np.pi, size=n)
+            self.codes = np.stack([np.cos(phases), -np.sin(phases)])
+        self.realization += 1
+        return self.codes
+
+    def _encode(self, signal, source):
+        a, b = self.codes[:, source]
+        encoded = a * signal
+        if b != 0.0:
+            encoded = encoded + b * np.imag(hilbert(signal, axis=0))
+        return encoded
+
+    def encode_wavelets(self, wavelet):
+        """Signals of the sources in the supershot, with shape
+        (number of sources, number of timesteps)."""
+        wavelet = np.asarray(wavelet, dtype=float)
+        return np.array([
+            self._encode(wavelet, source)
+            for source in range(self.number_of_sources)
+        ])
+
+    def encode_records(self, shot_records):
+        """Record of the supershot.
+
+        Parameters
+        ----------
+        shot_records: sequence
+            Records, with shape (timesteps, receivers), indexed by shot,
+            such as an array of every shot or a ``ShotRecordStore``.
+
+        Returns
+        -------
+        record: numpy.ndarray
+            Encoded record, with shape (timesteps, receivers).
+        """
+        record = None
+        for source in range(self.number_of_sources):
+            encoded = self._encode(np.asarray(shot_records[source]), source)
+            record = encoded if record is None else record + encoded
+        return record
@@ -3,6 +3,7 @@ from firedrake import *  # noqa: F403
 import numpy as np
 from mpi4py import MPI
 from scipy.signal import butter, filtfilt
+from .custom_ensemble import CustomEnsemble
 import warnings
 
 
@@ -37,26 +38,57 @@ def butter_lowpass_filter(shot, cutoff, fs, order=2):
     return filtered_shot
 
 
+def resample_shot_record(shot, dt, new_dt, final_time):
+    """Linearly interpolates a shot record to a new time step
+
+    Parameters
+    ----------
+    shot : numpy array
+        Shot record with shape (number of timesteps, number of receivers)
+    dt : float
+        Time step of the shot record
+    new_dt : float
+        New time step
+    final_time : float
+        Final time of the simulation
+
+    Returns
+    -------
+    resampled_shot : numpy array
+        Shot record with int(final_time / new_dt) + 1 timesteps
+    """
+    shot = np.asarray(shot)
+    nt = int(final_time / new_dt) + 1
+    positions = np.arange(nt) * new_dt / dt
+    lower = np.clip(np.floor(positions).astype(int), 0, shot.shape[0] - 2)
+    weights = np.clip(positions - lower, 0.0, 1.0)
+    weights = weights.reshape((nt,) + (1,) * (shot.ndim - 1))
+    return (1.0 - weights) * shot[lower] + weights * shot[lower + 1]
+
+
 def compute_functional(Wave_object, residual):
     """Compute the functional to be optimized.
     Accepts the velocity optionally and uses
     it if regularization is enabled
     """
-    num_receivers = Wave_object.number_of_receivers
     dt = Wave_object.dt
     comm = Wave_object.comm
 
-    J = 0
-    for rn in range(num_receivers):
-        J += np.trapz(residual[:, rn] ** 2, dx=dt)
+    # Residuals of several shots run by the same ensemble member
+    if isinstance(residual, dict):
+        residuals = list(residual.values())
+    else:
+        residuals = [residual]
+
+    J = 0.0
+    for shot_residual in residuals:
+        J += np.sum(np.trapz(np.asarray(shot_residual) ** 2, dx=dt, axis=0))
 
     J *= 0.5
 
-    J_total = np.zeros((1))
-    J_total[0] += J
-    J_total = COMM_WORLD.allreduce(J_total, op=MPI.SUM)
-    J_total[0] /= comm.comm.size
-    return J_total[0]
+    # Every core of a member has the same residual, so the sum across
+    # members of the same spatial rank is the total on every core
+    return comm.ensemble_comm.allreduce(J, op=MPI.SUM)
 
 
 def evaluate_misfit(model, guess, exact):
@@ -88,15 +120,19 @@ def mpi_init(model):
     available_cores = COMM_WORLD.size  # noqa: F405
     print(f"Parallelism type: {model.parallelism_type}", flush=True)
     if model.parallelism_type == "automatic":
-        num_cores_per_shot = available_cores / model.number_of_sources
-        if available_cores % model.number_of_sources != 0:
-            raise ValueError(
-                f"Available cores cannot be divided between sources equally {available_cores}/{model.number_of_sources}."
-            )
+        # Largest number of ensemble members, with the same number of
+        # cores each, that is not larger than the number of shots. The
+        # shots are then distributed by the shot scheduler.
+        number_of_members = max(
+            members
+            for members in range(1, min(available_cores, model.number_of_sources) + 1)
+            if available_cores % members == 0
+        )
+        num_cores_per_shot = available_cores // number_of_members
     elif model.parallelism_type == "spatial":
         num_cores_per_shot = available_cores
     elif model.parallelism_type == "custom":
-        raise ValueError("Custom parallelism not yet implemented")
+        return CustomEnsemble(COMM_WORLD, model.custom_cores_per_shot)  # noqa: F405
 
     comm_ens = Ensemble(COMM_WORLD, num_cores_per_shot)  # noqa: F405
     return comm_ens
@@ -118,7 +154,7 @@ def mpi_init_simple(number_of_sources):
     return comm_ens
 
 
-def communicate(array, my_ensemble):
+def communicate(array, my_ensemble, inplace=False):
     """Communicate shot record to all processors
 
     Parameters
@@ -128,6 +164,9 @@ def communicate(array, my_ensemble):
         and spatial communicators.
     comm: Firedrake.comm
         A Firedrake ensemble communicator
+    inplace: bool (optional)
+        If True, the reduction is done directly on ``array``, which has to
+        be a contiguous numpy array, instead of on a copy of it.
 
     Returns
     -------
@@ -136,12 +175,18 @@ def communicate(array, my_ensemble):
         amongst the ensemble communicator
 
     """
-    array_reduced = copy.copy(array)
+    if inplace:
+        array_reduced = array
+    else:
+        array_reduced = copy.copy(array)
 
     if my_ensemble.comm.size > 1:
         if my_ensemble.comm.rank == 0 and my_ensemble.ensemble_comm.rank == 0:
             print("Spatial parallelism, reducing to comm 0", flush=True)
-        my_ensemble.comm.Allreduce(array, array_reduced, op=MPI.MAX)
+        if inplace:
+            my_ensemble.comm.Allreduce(MPI.IN_PLACE, array_reduced, op=MPI.MAX)
+        else:
+            my_ensemble.comm.Allreduce(array, array_reduced, op=MPI.MAX)
     # print(array_reduced,array)
     return array_reduced
 
@@ -1,6 +1,7 @@
 import spyro
 from spyro import create_transect
 import math
+import time
 
 
 def test_estimate_timestep_mlt():
@@ -62,5 +63,51 @@ def test_estimate_timestep_mlt():
     assert all([test1, test2, test3, test4])
 
 
+def test_estimate_timestep_cache():
+    dictionary = {}
+    dictionary["options"] = {
+        "cell_type": "T",
+        "variant": "lumped",
+    }
+    dictionary["mesh"] = {
+        "Lz": 0.75,
+        "Lx": 1.5,
+        "h": 0.05,
+    }
+    dictionary["acquisition"] = {
+        "source_locations": [(-0.1, 0.75)],
+        "receiver_locations": create_transect((-0.10, 0.1), (-0.10, 1.4), 50),
+        "frequency": 8.0,
+    }
+    dictionary["time_axis"] = {
+        "final_time": 1.0,
+    }
+    Wave_obj = spyro.examples.Rectangle_acoustic(dictionary=dictionary)
+    Wave_obj.set_initial_velocity_model(constant=1.5)
+    spyro.utils.estimate_timestep.clear_timestep_cache()
+
+    t0 = time.time()
+    first_dt = Wave_obj.get_and_set_maximum_dt(fraction=1.0)
+    t1 = time.time()
+    cached_dt = Wave_obj.get_and_set_maximum_dt(fraction=1.0)
+    t2 = time.time()
+    print(f"First estimate took {t1 - t0} s, cached one {t2 - t1} s")
+
+    # Doubling the velocity halves the stable timestep
+    Wave_obj.initial_velocity_model.dat.data[:] = 3.0
+    new_dt = Wave_obj.get_and_set_maximum_dt(fraction=1.0)
+
+    test1 = cached_dt == first_dt
+    test2 = len(spyro.utils.estimate_timestep._timestep_cache) == 2
+    test3 = math.isclose(new_dt, first_dt / 2.0, rel_tol=1e-3)
+
+    print("Test 1: ", test1)
+    print("Test 2: ", test2)
+    print("Test 3: ", test3)
+
+    assert all([test1, test2, test3])
+
+
 if __name__ == "__main__":
     test_estimate_timestep_mlt()
+    test_estimate_timestep_cache()
@@ -0,0 +1,112 @@
+import numpy as np
+import spyro
+
+
+dictionary = {}
+dictionary["options"] = {
+    "cell_type": "T",  # simplexes such as triangles or tetrahedra (T) or quadrilaterals (Q)
+    "variant": "lumped",  # lumped, equispaced or DG, default is lumped
+    "degree": 4,  # p order
+    "dimension": 2,  # dimension
+}
+dictionary["parallelism"] = {
+    "type": "automatic",  # options: automatic (same number of cores for evey processor) or spatial
+}
+dictionary["mesh"] = {
+    "Lz": 3.0,  # depth in km - always positive
+    "Lx": 3.0,  # width in km - always positive
+    "Ly": 0.0,  # thickness in km - always positive
+    "mesh_file": None,
+    "mesh_type": "firedrake_mesh",
+}
+dictionary["acquisition"] = {
+    "source_type": "ricker",
+    "source_locations": [(-0.5, 1.5)],
+    "frequency": 5.0,
+    "delay": 1.5,
+    "delay_type": "multiples_of_minimun",
+    "receiver_locations": spyro.create_transect((-2.9, 0.1), (-2.9, 2.9), 50),
+}
+dictionary["time_axis"] = {
+    "initial_time": 0.0,  # Initial time for event
+    "final_time": 1.0,  # Final time for event
+    "dt": 0.0005,  # timestep size
+    "amplitude": 1,  # the Ricker has an amplitude of 1.
+    "output_frequency": 100,  # how frequently to output solution to pvds
+    "gradient_sampling_frequency": 1,  # how frequently to save solution to RAM
+}
+dictionary["visualization"] = {
+    "forward_output": False,
+    "forward_output_filename": "results/forward_output.pvd",
+    "fwi_velocity_model_output": False,
+    "velocity_model_filename": None,
+    "gradient_output": False,
+    "gradient_filename": "results/Gradient.pvd",
+    "adjoint_output": False,
+    "adjoint_filename": None,
+    "debug_output": False,
+}
+dictionary["inversion"] = {
+    "perform_fwi": True,
+    "initial_guess_model_file": None,
+    "shot_record_file": None,
+}
+
+
+def test_resample_shot_record():
+    dt = 0.001
+    final_time = 1.0
+    t = np.arange(int(final_time / dt) + 1) * dt
+    shot = np.column_stack([np.sin(2 * np.pi * t), t])
+
+    resampled = spyro.utils.utils.resample_shot_record(shot, dt, 0.004, final_time)
+    new_t = np.arange(int(final_time / 0.004) + 1) * 0.004
+
+    assert resampled.shape == (len(new_t), 2)
+    assert np.allclose(resampled[:, 1], new_t)
+    assert np.allclose(resampled[:, 0], np.sin(2 * np.pi * new_t), atol=1e-5)
+
+
+def test_fwi_degree_continuation():
+    FWI_obj = spyro.FullWaveformInversion(dictionary=dictionary)
+    FWI_obj.set_real_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_real_velocity_model(
+        expression="4.0 + 1.0 * tanh(10.0 * (0.5 - sqrt((x - 1.5) ** 2 + (z + 1.5) ** 2)))",
+    )
+    FWI_obj.generate_real_shot_record()
+    real_shot_record = FWI_obj.real_shot_record
+
+    FWI_obj.set_guess_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_guess_velocity_model(constant=4.0)
+    mesh = FWI_obj.mesh
+
+    stages = [
+        {"degree": 2, "cutoff_frequency": 4.0, "maxiter": 2},
+        {"degree": 4, "dt": 0.0005, "maxiter": 2},
+    ]
+    results = FWI_obj.run_fwi_with_degree_continuation(
+        stages, vmin=3.0, vmax=5.0
+    )
+
+    # Same mesh, final degree, and the observed data is restored
+    test1 = FWI_obj.mesh is mesh
+    test2 = FWI_obj.function_space.ufl_element().degree() == 4
+    test3 = FWI_obj.real_shot_record is real_shot_record
+    # The last stage starts from the model of the previous one and lowers
+    # its functional
+    test4 = len(results) == 2
+    stage_functionals = FWI_obj.functional_history[-results[1].nfev:]
+    test5 = results[1].fun < stage_functionals[0]
+
+    print(f"Same mesh: {test1}")
+    print(f"Final degree: {test2}")
+    print(f"Observed data restored: {test3}")
+    print(f"Stages run: {test4}")
+    print(f"Functional decreased in last stage: {test5}")
+
+    assert all([test1, test2, test3, test4, test5])
+
+
+if __name__ == "__main__":
+    test_resample_shot_record()
+    test_fwi_degree_continuation()
@@ -0,0 +1,41 @@
+import numpy as np
+import spyro
+
+from .test_fwi_degree_continuation import dictionary
+
+
+def test_fwi_evaluation_cache():
+    FWI_obj = spyro.FullWaveformInversion(dictionary=dictionary)
+    FWI_obj.set_real_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_real_velocity_model(
+        expression="4.0 + 1.0 * tanh(10.0 * (0.5 - sqrt((x - 1.5) ** 2 + (z + 1.5) ** 2)))",
+    )
+    FWI_obj.generate_real_shot_record()
+
+    FWI_obj.set_guess_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_guess_velocity_model(constant=4.0)
+    FWI_obj.initial_velocity_model = FWI_obj.guess_velocity_model
+    c0 = FWI_obj.initial_velocity_model.dat.data_ro.copy()
+
+    # The gradient reuses the forward solution of the functional
+    J = FWI_obj.get_functional(c=c0)
+    FWI_obj.get_gradient(c=c0)
+    test1 = len(FWI_obj.functional_history) == 1
+
+    # Revisiting a model does not propagate again
+    J0, dJ0 = FWI_obj.return_functional_and_gradient(c0)
+    J1, dJ1 = FWI_obj.return_functional_and_gradient(c0 + 0.1)
+    J2, dJ2 = FWI_obj.return_functional_and_gradient(c0)
+    test2 = len(FWI_obj.functional_history) == 3
+    test3 = J2 == J0 and np.array_equal(dJ2, dJ0)
+    test4 = np.isclose(J0, J)
+
+    print(f"Gradient reused the forward solution: {test1}")
+    print(f"Cached evaluation avoided a propagation: {test2}")
+    print(f"Cached values are the same: {test3}")
+
+    assert all([test1, test2, test3, test4])
+
+
+if __name__ == "__main__":
+    test_fwi_evaluation_cache()
@@ -0,0 +1,33 @@
+import spyro
+
+from .test_fwi_degree_continuation import dictionary
+
+
+def test_fwi_tao():
+    FWI_obj = spyro.FullWaveformInversion(dictionary=dictionary)
+    FWI_obj.set_real_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_real_velocity_model(
+        expression="4.0 + 1.0 * tanh(10.0 * (0.5 - sqrt((x - 1.5) ** 2 + (z + 1.5) ** 2)))",
+    )
+    FWI_obj.generate_real_shot_record()
+
+    FWI_obj.set_guess_mesh(mesh_parameters={"dx": 0.1})
+    FWI_obj.set_guess_velocity_model(constant=4.0)
+    FWI_obj.initial_velocity_model = FWI_obj.guess_velocity_model
+
+    tao = FWI_obj.run_fwi_tao(vmin=3.0, vmax=5.0, maxiter=3)
+
+    vp = FWI_obj.initial_velocity_model.dat.data_ro
+    test1 = tao.getIterationNumber() > 0
+    test2 = min(FWI_obj.functional_history) < FWI_obj.functional_history[0]
+    test3 = vp.min() >= 3.0 and vp.max() <= 5.0
+
+    print(f"Iterations run: {test1}")
+    print(f"Functional decreased: {test2}")
+    print(f"Bounds respected: {test3}")
+
+    assert all([test1, test2, test3])
+
+
+if __name__ == "__main__":
+    test_fwi_tao()
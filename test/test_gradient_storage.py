@@ -0,0 +1,222 @@
+import os
+import numpy as np
+from copy import deepcopy
+import firedrake as fire
+import spyro
+
+
+final_time = 0.5
+
+dictionary = {}
+dictionary["options"] = {
+    "cell_type": "T",  # simplexes such as triangles or tetrahedra (T) or quadrilaterals (Q)
+    "variant": "lumped",  # lumped, equispaced or DG, default is lumped
+    "degree": 4,  # p order
+    "dimension": 2,  # dimension
+}
+
+dictionary["parallelism"] = {
+    "type": "automatic",  # options: automatic (same number of cores for evey processor) or spatial
+}
+
+dictionary["mesh"] = {
+    "Lz": 3.0,  # depth in km - always positive
+    "Lx": 3.0,  # width in km - always positive
+    "Ly": 0.0,  # thickness in km - always positive
+    "mesh_file": None,
+    "mesh_type": "firedrake_mesh",
+}
+
+dictionary["acquisition"] = {
+    "source_type": "ricker",
+    "source_locations": [(-1.1, 1.5)],
+    "frequency": 5.0,
+    "delay": 1.5,
+    "delay_type": "multiples_of_minimun",
+    "receiver_locations": spyro.create_transect((-1.8, 1.2), (-1.8, 1.8), 10),
+}
+
+dictionary["time_axis"] = {
+    "initial_time": 0.0,  # Initial time for event
+    "final_time": final_time,  # Final time for event
+    "dt": 0.0005,  # timestep size
+    "amplitude": 1,  # the Ricker has an amplitude of 1.
+    "output_frequency": 100,  # how frequently to output solution to pvds
+    "gradient_sampling_frequency": 1,  # how frequently to save solution to RAM
+}
+
+dictionary["visualization"] = {
+    "forward_output": False,
+    "forward_output_filename": "results/forward_output.pvd",
+    "fwi_velocity_model_output": False,
+    "velocity_model_filename": None,
+    "gradient_output": False,
+    "gradient_filename": "results/Gradient.pvd",
+    "adjoint_output": False,
+    "adjoint_filename": None,
+    "debug_output": False,
+}
+
+
+def get_exact_shot_record():
+    Wave_obj_exact = spyro.AcousticWave(dictionary=dictionary)
+    Wave_obj_exact.set_mesh(mesh_parameters={"dx": 0.1})
+    cond = fire.conditional(Wave_obj_exact.mesh_z > -1.5, 1.5, 3.5)
+    Wave_obj_exact.set_initial_velocity_model(conditional=cond)
+    Wave_obj_exact.forward_solve()
+    return Wave_obj_exact.receivers_output
+
+
+def get_wave(velocity=2.0, **time_axis_options):
+    local_dictionary = deepcopy(dictionary)
+    local_dictionary["time_axis"].update(time_axis_options)
+
+    Wave_obj = spyro.AcousticWave(dictionary=local_dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.1})
+    Wave_obj.set_initial_velocity_model(constant=velocity)
+    return Wave_obj
+
+
+def relative_difference(reference, value):
+    return np.linalg.norm(reference - value) / np.linalg.norm(reference)
+
+
+def get_gradient(rec_out_exact, **time_axis_options):
+    Wave_obj_guess = get_wave(**time_axis_options)
+    Wave_obj_guess.forward_solve()
+
+    misfit = rec_out_exact - Wave_obj_guess.receivers_output
+    dJ = Wave_obj_guess.gradient_solve(misfit=misfit)
+    return dJ.dat.data[:].copy(), Wave_obj_guess
+
+
+def test_checkpointed_gradient():
+    rec_out_exact = get_exact_shot_record()
+
+    dJ_memory, _ = get_gradient(rec_out_exact)
+    dJ_checkpointed, Wave_obj = get_gradient(
+        rec_out_exact,
+        forward_storage="checkpointing",
+        number_of_checkpoints=8,
+    )
+
+    assert relative_difference(dJ_memory, dJ_checkpointed) < 1e-10
+    assert Wave_obj.forward_solution.number_of_recomputed_steps > 0
+
+
+def test_disk_snapshot_gradient():
+    rec_out_exact = get_exact_shot_record()
+
+    dJ_memory, _ = get_gradient(rec_out_exact)
+    dJ_disk, Wave_obj = get_gradient(
+        rec_out_exact,
+        forward_storage="disk",
+        snapshot_directory="results/snapshots",
+    )
+
+    assert np.allclose(dJ_memory, dJ_disk, rtol=1e-12, atol=0.0)
+    # The snapshot file is removed once the adjoint consumed it
+    assert not os.path.exists(Wave_obj.forward_solution.file_name)
+
+
+def test_compressed_snapshot_gradient():
+    rec_out_exact = get_exact_shot_record()
+    dJ_memory, _ = get_gradient(rec_out_exact)
+
+    errors = {}
+    for compression, tolerance in [("float32", None), ("quantized", 1e-4), ("quantized", 1e-2)]:
+        options = {"snapshot_compression": compression}
+        if tolerance is not None:
+            options["compression_tolerance"] = tolerance
+        dJ_compressed, _ = get_gradient(rec_out_exact, **options)
+        errors[(compression, tolerance)] = np.linalg.norm(dJ_memory - dJ_compressed) / np.linalg.norm(dJ_memory)
+        print(f"Relative gradient error with {compression} ({tolerance}): {errors[(compression, tolerance)]}")
+
+    test1 = errors[("float32", None)] < 1e-5
+    test2 = errors[("quantized", 1e-4)] < 1e-3
+    test3 = errors[("quantized", 1e-2)] < 5e-2
+
+    assert all([test1, test2, test3])
+
+
+def test_quantization_error_bound():
+    data = np.random.rand(1000) - 0.5
+    codec = spyro.solvers.snapshot_compression.QuantizationCodec.from_tolerance(1e-3)
+    payload, scale = codec.encode(data)
+    assert payload.dtype == np.int16
+    assert np.max(np.abs(codec.decode(payload, scale) - data)) <= codec.error_bound(data) * (1 + 1e-12)
+
+
+def test_revolve_schedule():
+    # Every sample has to be returned once, in reverse order, with a
+    # bounded number of stored checkpoints
+    number_of_samples = 50
+    snapshots = 4
+    checkpoints = spyro.solvers.checkpointing.first_sweep_checkpoints(
+        number_of_samples, snapshots
+    )
+    assert checkpoints[0] == 0
+    assert len(checkpoints) <= snapshots + 1
+    assert all(np.diff(checkpoints) > 0)
+    assert checkpoints[-1] < number_of_samples
+
+
+def test_explicit_update_forward():
+    # The pre-assembled update has to match the solve with the assembled
+    # right hand side
+    records = []
+    for explicit_update in [False, True]:
+        Wave_obj = get_wave(explicit_update=explicit_update)
+        Wave_obj.forward_solve()
+        records.append(Wave_obj.receivers_output)
+
+    assert Wave_obj.stiffness_matrix is not None
+    assert np.allclose(records[0], records[1], rtol=1e-10, atol=1e-14)
+
+
+def test_operator_reuse():
+    # Changing the velocity values in place reuses the operators and has
+    # to give the same shot record as building a new wave object
+    Wave_obj = get_wave()
+    Wave_obj.forward_solve()
+    solver_operator = Wave_obj.solver.A
+    rhs_forms = Wave_obj.state_ring.rhs_forms
+
+    Wave_obj.initial_velocity_model.dat.data[:] = 2.5
+    Wave_obj.forward_solve()
+    reused_record = Wave_obj.receivers_output
+
+    Wave_obj_new = get_wave(velocity=2.5)
+    Wave_obj_new.forward_solve()
+
+    assert Wave_obj.solver.A is solver_operator
+    assert Wave_obj.state_ring.rhs_forms is rhs_forms
+    assert relative_difference(Wave_obj_new.receivers_output, reused_record) < 1e-10
+
+
+def test_accumulated_gradient():
+    # Accumulating the gradient samples and solving the mass problem once
+    # has to match solving it for every sample
+    rec_out_exact = get_exact_shot_record()
+    backward = spyro.solvers.backward_time_integration.backward_wave_propagator
+
+    gradients = []
+    for accumulate_gradient in [False, True]:
+        Wave_obj = get_wave()
+        Wave_obj.forward_solve()
+        Wave_obj.misfit = rec_out_exact - Wave_obj.receivers_output
+        dJ = backward(Wave_obj, accumulate_gradient=accumulate_gradient)
+        gradients.append(dJ.dat.data_ro.copy())
+
+    assert relative_difference(gradients[0], gradients[1]) < 1e-12
+
+
+if __name__ == "__main__":
+    test_revolve_schedule()
+    test_checkpointed_gradient()
+    test_disk_snapshot_gradient()
+    test_quantization_error_bound()
+    test_compressed_snapshot_gradient()
+    test_explicit_update_forward()
+    test_operator_reuse()
+    test_accumulated_gradient()
@@ -1,5 +1,8 @@
 import firedrake as fire
+import h5py
 import math
+import numpy as np
+import os
 import pytest
 import spyro
 
@@ -92,6 +95,16 @@ def test_saving_shot_record():
     Wave_obj.forward_solve()
     spyro.io.save_shots(Wave_obj, file_name="test_shot_record")
 
+    Wave_obj_loaded = spyro.AcousticWave(dictionary=dictionary)
+    spyro.io.load_shots(Wave_obj_loaded, file_name="test_shot_record")
+    test1 = sorted(Wave_obj_loaded.shot_records) == sorted(Wave_obj.shot_records)
+    test2 = all(
+        np.allclose(record, Wave_obj.shot_records[snum], rtol=1e-5, atol=1e-8)
+        for snum, record in Wave_obj_loaded.shot_records.items()
+    )
+
+    assert all([test1, test2])
+
 
 def test_loading_shot_record():
     from .inputfiles.model import dictionary
@@ -101,8 +114,126 @@ def test_loading_shot_record():
     Wave_obj.set_mesh(mesh_parameters={"dx": 0.02})
     spyro.io.load_shots(Wave_obj, file_name="test_shot_record")
 
+    store = spyro.io.ShotRecordStore("shots/test_shot_record")
+    test1 = len(Wave_obj.shot_records) > 0
+    test2 = all(
+        np.array_equal(record, store.read(snum))
+        for snum, record in Wave_obj.shot_records.items()
+    )
+    test3 = Wave_obj.forward_solution_receivers.shape == store.shape[1:]
+
+    assert all([test1, test2, test3])
+
+
+def test_shot_record_store():
+    records = np.random.rand(3, 50, 4)
+    for compression in [None, "zlib"]:
+        directory = f"shots/test_store_{compression}"
+        store = spyro.io.ShotRecordStore.create(
+            directory, records.shape, compression=compression
+        )
+        for shot, record in enumerate(records):
+            store.write(shot, record)
+
+        store = spyro.io.ShotRecordStore(directory)
+        test1 = store.read(1).dtype == np.float64
+        test2 = np.allclose(store[1], records[1], rtol=1e-6)
+        test3 = np.allclose(store.read(2, receivers=[0, 3]), records[2][:, [0, 3]], rtol=1e-6)
+
+        assert all([test1, test2, test3])
+
+
+def test_grid_resampler():
+    mesh = fire.UnitSquareMesh(10, 10)
+    mesh.coordinates.dat.data[:, 0] *= -1
+    V = fire.FunctionSpace(mesh, "CG", 3)
+    z, x = fire.SpatialCoordinate(mesh)
+
+    f = fire.Function(V).interpolate(2.0 + z * x)
+    xi, yi, zi = spyro.io.write_function_to_grid(f, V, 0.05)
+    resampler = spyro.io.basicio.get_grid_resampler(V, 0.05)
+
+    g = fire.Function(V).interpolate(1.0 - z)
+    _, _, gi = spyro.io.write_function_to_grid(g, V, 0.05)
+
+    test1 = np.allclose(zi, (2.0 + xi * yi) * 1000.0)
+    test2 = np.allclose(gi, (1.0 - xi) * 1000.0)
+    test3 = spyro.io.basicio.get_grid_resampler(V, 0.05) is resampler
+
+    assert all([test1, test2, test3])
+
+
+def test_windowed_hdf5_interpolation():
+    from .inputfiles.model import dictionary
+
+    Wave_obj = spyro.AcousticWave(dictionary=dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.05})
+    V = Wave_obj.function_space
+
+    # A bilinear model is interpolated exactly
+    z = np.linspace(-1.0, 0.0, 51)
+    x = np.linspace(0.0, 1.0, 41)
+    Z, X = np.meshgrid(z, x, indexing="ij")
+    cache_directory = "velocity_models/interpolation_cache"
+    file_names = []
+    for slope in [1.0, 2.0]:
+        file_name = f"velocity_models/bilinear_{slope}.hdf5"
+        with h5py.File(file_name, "w") as f:
+            f.create_dataset("velocity_model", data=1.5 + slope * (X - Z + X * Z))
+        file_names.append(file_name)
+
+    z_dofs, x_dofs = fire.SpatialCoordinate(Wave_obj.mesh)
+    errors = []
+    for slope, file_name in zip([1.0, 2.0], file_names):
+        vp = spyro.io.interpolate(
+            Wave_obj, file_name, V, cache_directory=cache_directory
+        )
+        exact = fire.Function(V).interpolate(
+            1.5 + slope * (x_dofs - z_dofs + x_dofs * z_dofs)
+        )
+        errors.append(np.max(np.abs(vp.dat.data_ro - exact.dat.data_ro)))
+
+    test1 = all(error < 1e-12 for error in errors)
+    test2 = len(spyro.io.basicio._interpolation_weights) > 0
+    test3 = len(os.listdir(cache_directory)) > 0
+
+    assert all([test1, test2, test3])
+
+
+def test_segy_conversion_cache():
+    from .inputfiles.model import dictionary
+
+    Wave_obj = spyro.AcousticWave(dictionary=dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.05})
+    V = Wave_obj.function_space
+
+    z = np.linspace(-1.0, 0.0, 51)
+    x = np.linspace(0.0, 1.0, 41)
+    Z, X = np.meshgrid(z, x, indexing="ij")
+    segy_file = "velocity_models/layered.segy"
+    # create_segy takes the transpose of the HDF5 layout
+    spyro.io.create_segy((1.5 + (Z < -0.5) * 1.5).T, segy_file)
+
+    cache_directory = "velocity_models/segy_cache"
+    hdf5_file = spyro.io.convert_segy_to_hdf5(segy_file, cache_directory=cache_directory)
+    modification_time = os.path.getmtime(hdf5_file)
+    cached_file = spyro.io.convert_segy_to_hdf5(segy_file, cache_directory=cache_directory)
+
+    vp_hdf5 = spyro.io.interpolate(Wave_obj, hdf5_file, V)
+    vp_segy = spyro.io.interpolate(Wave_obj, segy_file, V)
+
+    test1 = cached_file == hdf5_file
+    test2 = os.path.getmtime(cached_file) == modification_time
+    test3 = np.allclose(vp_hdf5.dat.data_ro, vp_segy.dat.data_ro)
+
+    assert all([test1, test2, test3])
+
 
 if __name__ == "__main__":
     test_read_and_write_segy()
+    test_windowed_hdf5_interpolation()
+    test_segy_conversion_cache()
     test_saving_shot_record()
     test_loading_shot_record()
+    test_shot_record_store()
+    test_grid_resampler()
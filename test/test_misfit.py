@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import spyro
+
+
+def records():
+    dt = 0.002
+    t = np.arange(500) * dt
+    amplitudes = np.array([1.0, 2.0, 0.5])
+    observed = np.sin(2 * np.pi * 5.0 * (t - 0.4))[:, np.newaxis] * amplitudes
+    observed *= np.exp(-((t - 0.5) / 0.2) ** 2)[:, np.newaxis]
+    guess = np.sin(2 * np.pi * 5.0 * (t - 0.43))[:, np.newaxis] * amplitudes[::-1]
+    guess *= np.exp(-((t - 0.53) / 0.2) ** 2)[:, np.newaxis]
+    return guess, observed, dt
+
+
+@pytest.mark.parametrize(
+    "misfit_type", ["l2", "cross_correlation", "envelope", "trace_normalized"]
+)
+@pytest.mark.parametrize("time_window", [None, (0.2, 0.8)])
+def test_misfit_adjoint_source(misfit_type, time_window):
+    guess, observed, dt = records()
+    misfit = spyro.utils.MisfitFunction(
+        misfit_type=misfit_type,
+        time_window=time_window,
+        receiver_weights=[1.0, 0.5, 2.0],
+    )
+    J, adjoint_source = misfit.evaluate(guess, observed, dt)
+    assert J > 0.0
+    assert adjoint_source.shape == guess.shape
+
+    # The adjoint source is -1/dt times the derivative of the functional
+    rng = np.random.default_rng(3)
+    direction = rng.standard_normal(guess.shape)
+    h = 1e-6
+    J_plus, _ = misfit.evaluate(guess + h * direction, observed, dt)
+    J_minus, _ = misfit.evaluate(guess - h * direction, observed, dt)
+    finite_difference = (J_plus - J_minus) / (2 * h)
+    derivative = -dt * np.sum(adjoint_source * direction)
+    assert np.isclose(finite_difference, derivative, rtol=1e-3)
+
+
+def test_l2_misfit_matches_residual():
+    guess, observed, dt = records()
+    J, adjoint_source = spyro.utils.MisfitFunction().evaluate(guess, observed, dt)
+    residual = observed - guess
+    J_loop = 0.0
+    for rn in range(residual.shape[1]):
+        J_loop += 0.5 * np.trapz(residual[:, rn] ** 2, dx=dt)
+    assert np.isclose(J, J_loop)
+    # The end samples carry the half weights of the trapezoidal rule
+    assert np.allclose(adjoint_source[1:-1], residual[1:-1])
+    assert np.allclose(adjoint_source[[0, -1]], 0.5 * residual[[0, -1]])
+
+
+if __name__ == "__main__":
+    test_misfit_adjoint_source("envelope", (0.2, 0.8))
+    test_l2_misfit_matches_residual()
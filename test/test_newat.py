@@ -117,6 +117,29 @@ def test_correct_at_value2D():
     assert all([test1, test2])
 
 
+def test_batched_interpolation2D():
+    oldmodel["opts"]["degree"] = 3
+    recvs = spyro.create_transect((-0.1, 0.2), (-0.1, 0.8), 20)
+    oldmodel["acquisition"]["receiver_locations"] = recvs
+    oldmodel["acquisition"]["num_receivers"] = 20
+
+    model = spyro.AcousticWave(dictionary=oldmodel)
+    mesh = model.mesh
+    receivers = spyro.Receivers(model)
+    V = receivers.space
+    z, x = SpatialCoordinate(mesh)
+
+    u1 = Function(V).interpolate(sin(x) * z * 2)
+    batched = receivers.interpolate(u1.dat.data_ro_with_halos[:])
+    one_by_one = [
+        receivers.new_at(u1.dat.data_ro_with_halos[:], rn)
+        for rn in range(receivers.number_of_points)
+    ]
+
+    assert batched.shape == (20,)
+    assert np.allclose(batched, one_by_one, rtol=1e-12, atol=1e-14)
+
+
 def test_correct_at_value2D_quad():
     oldmodel_quad = deepcopy(oldmodel)
     oldmodel_quad["opts"]["degree"] = 3
@@ -313,6 +336,7 @@ if __name__ == "__main__":
     test_correct_receiver_location_generation2D()
     test_correct_receiver_to_cell_location2D()
     test_correct_at_value2D()
+    test_batched_interpolation2D()
     test_correct_at_value2D_quad()
     test_correct_receiver_location_generation3D()
     test_correct_receiver_to_cell_location3D()
@@ -0,0 +1,115 @@
+import numpy as np
+from copy import deepcopy
+import spyro
+
+
+dictionary = {}
+dictionary["options"] = {
+    "cell_type": "T",
+    "variant": "lumped",
+    "degree": 4,
+    "dimension": 2,
+}
+dictionary["parallelism"] = {
+    "type": "automatic",
+    "shot_scheduling": "round_robin",
+}
+dictionary["mesh"] = {
+    "Lz": 1.0,
+    "Lx": 1.0,
+    "Ly": 0.0,
+    "mesh_file": None,
+    "mesh_type": "firedrake_mesh",
+}
+dictionary["acquisition"] = {
+    "source_type": "ricker",
+    "source_locations": [(-0.1, 0.3), (-0.1, 0.5), (-0.1, 0.7)],
+    "frequency": 5.0,
+    "delay": 1.5,
+    "delay_type": "multiples_of_minimun",
+    "receiver_locations": spyro.create_transect((-0.8, 0.2), (-0.8, 0.8), 10),
+}
+dictionary["time_axis"] = {
+    "initial_time": 0.0,
+    "final_time": 0.4,
+    "dt": 0.0005,
+    "amplitude": 1,
+    "output_frequency": 100,
+    "gradient_sampling_frequency": 1,
+}
+dictionary["visualization"] = {
+    "forward_output": False,
+    "gradient_output": False,
+    "adjoint_output": False,
+    "debug_output": False,
+}
+
+
+def run_gradient(local_dictionary):
+    Wave_obj = spyro.AcousticWave(dictionary=local_dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.05})
+    Wave_obj.set_initial_velocity_model(constant=2.5)
+    Wave_obj.forward_solve()
+    Wave_obj.set_last_solve_as_real_shot_record()
+    records = dict(Wave_obj.shot_records)
+
+    Wave_obj.initial_velocity_model.dat.data[:] = 2.0
+    Wave_obj.forward_solve()
+    if len(records) == 1:
+        misfit = Wave_obj.real_shot_record - Wave_obj.forward_solution_receivers
+        dJ = Wave_obj.gradient_solve(misfit=misfit)
+    else:
+        # The misfit of each shot is taken from the real shot records
+        dJ = Wave_obj.gradient_solve()
+    return records, dJ.dat.data_ro.copy()
+
+
+def test_shot_scheduler_serial():
+    # A single ensemble member runs every shot and sums their gradients
+    records, dJ = run_gradient(dictionary)
+
+    single_records = {}
+    single_dJ = np.zeros_like(dJ)
+    for snum, location in enumerate(dictionary["acquisition"]["source_locations"]):
+        local_dictionary = deepcopy(dictionary)
+        local_dictionary["acquisition"]["source_locations"] = [location]
+        shot_records, shot_dJ = run_gradient(local_dictionary)
+        single_records[snum] = shot_records[0]
+        single_dJ += shot_dJ
+
+    test1 = sorted(records) == [0, 1, 2]
+    test2 = all(np.allclose(records[snum], single_records[snum]) for snum in records)
+    test3 = np.allclose(dJ, single_dJ, rtol=1e-8)
+
+    # Dynamic scheduling runs the same shots, in an order known only at
+    # run time
+    dynamic_dictionary = deepcopy(dictionary)
+    dynamic_dictionary["parallelism"]["shot_scheduling"] = "dynamic"
+    dynamic_records, dynamic_dJ = run_gradient(dynamic_dictionary)
+    test4 = all(
+        np.allclose(dynamic_records[snum], single_records[snum])
+        for snum in dynamic_records
+    ) and np.allclose(dynamic_dJ, single_dJ, rtol=1e-8)
+
+    print(f"All shots run: {test1}")
+    print(f"Same records as single shots: {test2}")
+    print(f"Summed gradient: {test3}")
+    print(f"Dynamic scheduling: {test4}")
+
+    assert all([test1, test2, test3, test4])
+
+
+def test_dynamic_shot_scheduler():
+    local_dictionary = deepcopy(dictionary)
+    local_dictionary["parallelism"]["shot_scheduling"] = "dynamic"
+    Wave_obj = spyro.AcousticWave(dictionary=local_dictionary)
+    scheduler = spyro.io.ShotScheduler(Wave_obj.comm, 5, mode="dynamic")
+    shots = list(scheduler)
+    all_shots = Wave_obj.comm.ensemble_comm.allgather(shots)
+
+    assert sorted(sum(all_shots, [])) == list(range(5))
+
+
+if __name__ == "__main__":
+    test_shot_scheduler_serial()
+    test_dynamic_shot_scheduler()
@@ -0,0 +1,54 @@
+import numpy as np
+import spyro
+
+from test_shot_scheduler import dictionary
+
+
+def test_encoded_records():
+    rng = np.random.default_rng(0)
+    records = rng.standard_normal((3, 200, 4))
+
+    encoder = spyro.utils.SourceEncoding("random_sign", 3, seed=1)
+    signs = encoder.draw()[0]
+    test1 = np.all(np.abs(signs) == 1.0)
+    test2 = np.allclose(
+        encoder.encode_records(records), np.einsum("s,str->tr", signs, records)
+    )
+
+    # A phase rotation of zero is the identity
+    encoder = spyro.utils.SourceEncoding("random_phase", 3, seed=1)
+    encoder.draw()
+    encoder.codes = np.array([[1.0, 1.0, 1.0], [0.0, 0.0, 0.0]])
+    test3 = np.allclose(encoder.encode_records(records), records.sum(axis=0))
+    # and a rotation of pi / 2 twice is a change of sign
+    encoder.codes = np.array([[0.0, 0.0, 0.0], [-1.0, -1.0, -1.0]])
+    wavelet = np.sin(8.0 * np.pi * np.arange(256) / 256)
+    once = encoder.encode_wavelets(wavelet)[0]
+    twice = encoder.encode_wavelets(once)[0]
+    test4 = np.allclose(twice, -wavelet, atol=1e-8)
+
+    assert all([test1, test2, test3, test4])
+
+
+def test_encoded_supershot():
+    # The supershot record is the encoded sum of the shot records
+    Wave_obj = spyro.AcousticWave(dictionary=dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.05})
+    Wave_obj.set_initial_velocity_model(constant=2.5)
+    Wave_obj.forward_solve()
+    records = [Wave_obj.shot_records[snum] for snum in range(3)]
+
+    encoder = spyro.utils.SourceEncoding("random_sign", 3, seed=2)
+    encoder.draw()
+    Wave_obj.sources.set_simultaneous_sources(
+        wavelets=encoder.encode_wavelets(Wave_obj.sources.wavelet)
+    )
+    Wave_obj.forward_solve()
+    supershot = Wave_obj.forward_solution_receivers
+
+    assert np.allclose(supershot, encoder.encode_records(records))
+
+
+if __name__ == "__main__":
+    test_encoded_records()
+    test_encoded_supershot()
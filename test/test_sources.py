@@ -1,4 +1,6 @@
 import math
+import numpy as np
+import firedrake as fire
 from copy import deepcopy
 import spyro
 
@@ -58,5 +60,40 @@ def test_ricker_varies_in_time():
     assert all([test1, test2, test3, test4])
 
 
+def test_simultaneous_sources_injection():
+    """Tests that firing every source with an encoding is the weighted sum
+    of firing each source on its own"""
+    dictionary = {}
+    dictionary["parallelism"] = {"type": "spatial"}
+    dictionary["acquisition"] = {
+        "source_type": "ricker",
+        "source_locations": [(-0.1, 0.3), (-0.1, 0.5), (-0.1, 0.7)],
+        "frequency": 5.0,
+        "delay": 1.5,
+        "receiver_locations": spyro.create_transect((-0.8, 0.1), (-0.8, 0.9), 10),
+    }
+    dictionary["absorving_boundary_conditions"] = {"status": False}
+    Wave_obj = spyro.examples.Rectangle_acoustic(dictionary=dictionary)
+    sources = Wave_obj.sources
+    step = 100
+    weights = np.array([1.0, -1.0, 1.0])
+
+    expected = np.zeros_like(fire.Cofunction(Wave_obj.function_space.dual()).dat.data_ro_with_halos)
+    for source_id in range(sources.number_of_points):
+        rhs_forcing = fire.Cofunction(Wave_obj.function_space.dual())
+        sources.current_source = source_id
+        sources.apply_source(rhs_forcing, step)
+        expected += weights[source_id] * rhs_forcing.dat.data_ro_with_halos
+
+    rhs_forcing = fire.Cofunction(Wave_obj.function_space.dual())
+    sources.set_simultaneous_sources(weights=weights)
+    sources.apply_source(rhs_forcing, step)
+    sources.set_simultaneous_sources()
+
+    assert np.allclose(rhs_forcing.dat.data_ro_with_halos, expected)
+    assert sources.source_signals is None
+
+
 if __name__ == "__main__":
     test_ricker_varies_in_time()
+    test_simultaneous_sources_injection()
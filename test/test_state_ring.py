@@ -0,0 +1,31 @@
+import numpy as np
+import firedrake as fire
+from spyro.solvers.state_ring import StateRing
+
+
+def test_state_ring_rotation():
+    mesh = fire.UnitSquareMesh(4, 4)
+    V = fire.FunctionSpace(mesh, "CG", 1)
+    v = fire.TestFunction(V)
+    states = [fire.Function(V) for _ in range(3)]
+    u_nm1, u_n, u_np1 = states
+    rhs = (2.0 * u_n - u_nm1) * v * fire.dx
+
+    ring = StateRing(rhs, u_nm1, u_n, u_np1)
+    one = fire.assemble(v * fire.dx).dat.data_ro
+
+    # u_np1 = 2 u_n - u_nm1 starting from u_nm1 = 0 and u_n = 1 gives
+    # u = step + 1, without copying any state
+    u_n.assign(1.0)
+    for step in range(1, 5):
+        b = fire.assemble(ring.rhs)
+        assert np.allclose(b.dat.data_ro, (step + 1) * one)
+        ring.next_state.assign(step + 1.0)
+        ring.rotate()
+        assert ring.state is states[(step + 1) % 3]
+
+    assert ring.prev_state is states[4 % 3]
+
+
+if __name__ == "__main__":
+    test_state_ring_rotation()
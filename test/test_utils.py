@@ -2,6 +2,7 @@ import spyro
 import scipy as sp
 import numpy as np
 import math
+import firedrake as fire
 
 
 def test_butter_lowpast_filter():
@@ -61,6 +62,33 @@ def test_geometry_creation():
     assert all([test0, test1, test2, test3, test4, test5, test6])
 
 
+def test_stability_check():
+    comm = fire.Ensemble(fire.COMM_WORLD, fire.COMM_WORLD.size)
+    mesh = fire.UnitSquareMesh(4, 4, comm=comm.comm)
+    V = fire.FunctionSpace(mesh, "CG", 1)
+    u = fire.Function(V)
+    check_stability = spyro.solvers.helpers.check_stability
+
+    u.dat.data[:] = 0.5
+    for check in ["max", "norm", None]:
+        check_stability(u, comm, check=check)
+
+    results = []
+    for value in [2.0, np.nan, np.inf]:
+        u.dat.data[:] = value
+        try:
+            check_stability(u, comm, check="max")
+            results.append(False)
+        except AssertionError:
+            results.append(True)
+
+    # A disabled check never raises
+    check_stability(u, comm, check=None)
+
+    assert all(results)
+
+
 if __name__ == "__main__":
     test_butter_lowpast_filter()
     test_geometry_creation()
+    test_stability_check()
@@ -0,0 +1,95 @@
+from mpi4py.MPI import COMM_WORLD
+from mpi4py import MPI
+import numpy as np
+import firedrake as fire
+import spyro
+
+
+def error_calc(p_numerical, p_analytical, nt):
+    norm = np.linalg.norm(p_numerical, 2) / np.sqrt(nt)
+    error_time = np.linalg.norm(p_analytical - p_numerical, 2) / np.sqrt(nt)
+    div_error_time = error_time / norm
+    return div_error_time
+
+
+def test_custom_cores_per_shot():
+    # Run with mpiexec -n 6: the three shots get 1, 2 and 3 cores
+    dictionary = {}
+    dictionary["options"] = {
+        "cell_type": "Q",
+        "variant": "lumped",
+        "degree": 4,
+        "dimension": 2,
+    }
+    dictionary["parallelism"] = {
+        "type": "custom",
+        "custom_cores_per_shot": [1, 2, 3],
+    }
+    dictionary["mesh"] = {
+        "Lz": 3.0,
+        "Lx": 3.0,
+        "Ly": 0.0,
+        "mesh_file": None,
+        "mesh_type": "firedrake_mesh",
+    }
+    dictionary["acquisition"] = {
+        "source_type": "ricker",
+        "source_locations": [(-1.1, 1.2), (-1.1, 1.5), (-1.1, 1.8)],
+        "frequency": 5.0,
+        "delay": 0.2,
+        "delay_type": "time",
+        "receiver_locations": spyro.create_transect((-1.3, 1.2), (-1.3, 1.8), 301),
+    }
+    dictionary["time_axis"] = {
+        "initial_time": 0.0,
+        "final_time": 1.0,
+        "dt": 0.001,
+        "amplitude": 1,
+        "output_frequency": 100,
+        "gradient_sampling_frequency": 1,
+    }
+    dictionary["visualization"] = {
+        "forward_output": False,
+        "fwi_velocity_model_output": False,
+        "velocity_model_filename": None,
+        "gradient_output": False,
+        "gradient_filename": None,
+    }
+
+    Wave_obj = spyro.AcousticWave(dictionary=dictionary)
+    Wave_obj.set_mesh(mesh_parameters={"dx": 0.1})
+    Wave_obj.set_initial_velocity_model(constant=1.5)
+    Wave_obj.forward_solve()
+
+    comm = Wave_obj.comm
+    member = comm.ensemble_comm.rank
+    test1 = comm.comm.size == dictionary["parallelism"]["custom_cores_per_shot"][member]
+
+    analytical_p = spyro.utils.nodal_homogeneous_analytical(
+        Wave_obj, 0.2, 1.5, n_extra=100
+    )
+    rec_id = [0, 150, 300][member]
+    arr0 = Wave_obj.receivers_output[:, rec_id].flatten()
+    error = error_calc(arr0[:430], analytical_p[:430], 430)
+    error_all = COMM_WORLD.allreduce(error, op=MPI.SUM) / 3
+    test2 = np.abs(error_all) < 0.01
+
+    # Reduction of Functions on differently partitioned meshes
+    z, x = fire.SpatialCoordinate(Wave_obj.mesh)
+    V = Wave_obj.function_space
+    f = fire.Function(V).interpolate((member + 1) * (z + x))
+    f_reduced = comm.allreduce(f, fire.Function(V))
+    expected = fire.Function(V).interpolate(6.0 * (z + x))
+    test3 = np.allclose(f_reduced.dat.data_ro, expected.dat.data_ro)
+    test3 = COMM_WORLD.allreduce(test3, op=MPI.LAND)
+
+    # Reduction of a gradient together with a functional
+    g_reduced, J = spyro.utils.reduce_gradient(comm, f, functional=member + 1.0)
+    test4 = np.allclose(g_reduced.dat.data_ro, expected.dat.data_ro)
+    test4 = COMM_WORLD.allreduce(test4, op=MPI.LAND) and np.isclose(J, 6.0)
+
+    assert all([test1, test2, test3, test4])
+
+
+if __name__ == "__main__":
+    test_custom_cores_per_shot()